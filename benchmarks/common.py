@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+"""Measurement, servers and JSON results shared by the benchmarks."""
+import datetime as dt
+import gc
+import json
+import math
+import multiprocessing
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import clickhousepy
+from clickhousepy import Client
+
+
+def percentile(values, q):
+    """
+    :param values: list : not empty
+    :param q: int, float : 0-100
+    :return: float : the value with linear interpolation between the closest ranks
+    """
+    values = sorted(values)
+    position = (len(values) - 1) * q / 100
+    low, high = math.floor(position), math.ceil(position)
+    return values[low] + (values[high] - values[low]) * (position - low)
+
+
+def measure(func, repeat=5, warmup=1, items=None, setup=None):
+    """
+    The timings are taken without tracemalloc, which slows down allocations,
+    the peak memory is measured by one more call.
+
+    :param func: callable : the measured call
+    :param repeat: int : number of measured calls
+    :param warmup: int : number of calls before the measurement
+    :param items: int, None : number of rows processed by one call, for the throughput
+    :param setup: callable, None : is called before each call, not measured
+    :return: dict
+    """
+    setup = setup or (lambda: None)
+    for _ in range(warmup):
+        setup()
+        func()
+
+    timings = []
+    for _ in range(repeat):
+        setup()
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+
+    setup()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return summarize(timings, peak, items)
+
+
+def summarize(timings, peak, items=None):
+    """
+    :param timings: list : seconds of the calls
+    :param peak: int : peak memory in bytes
+    :param items: int, None : number of rows processed by one call, for the throughput
+    :return: dict
+    """
+    result = {
+        "repeat": len(timings),
+        "min": min(timings),
+        "mean": statistics.mean(timings),
+        "p50": percentile(timings, 50),
+        "p90": percentile(timings, 90),
+        "p99": percentile(timings, 99),
+        "max": max(timings),
+        "peak_memory_bytes": peak,
+    }
+    if items is not None:
+        result["items"] = items
+        result["items_per_sec"] = items / result["p50"] if result["p50"] else None
+    return result
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    """
+    :return: dict : versions and the commit, to compare the results of different runs
+    """
+    import clickhouse_driver
+
+    return {
+        "date": dt.datetime.now().isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "clickhousepy": clickhousepy.__version__,
+        "clickhouse_driver": clickhouse_driver.__version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+    }
+
+
+def save(path, parameters, results):
+    """
+    :param path: str
+    :param parameters: dict : parameters of the run
+    :param results: dict : {name: result of measure}
+    """
+    with open(path, "w") as f:
+        json.dump(
+            {"environment": environment(), "parameters": parameters, "results": results},
+            f,
+            indent=2,
+            sort_keys=True,
+        )
+
+
+def print_results(results):
+    print(
+        "{:<36} {:>9} {:>9} {:>9} {:>12} {:>10}".format(
+            "benchmark", "p50 sec", "p90 sec", "p99 sec", "rows/sec", "peak MiB"
+        )
+    )
+    for name, result in results.items():
+        print(
+            "{:<36} {:>9.4f} {:>9.4f} {:>9.4f} {:>12} {:>10.1f}".format(
+                name,
+                result["p50"],
+                result["p90"],
+                result["p99"],
+                "{:.0f}".format(result["items_per_sec"]) if result.get("items_per_sec") else "-",
+                result["peak_memory_bytes"] / 2 ** 20,
+            )
+        )
+
+
+def _serve(connection, mutation_delay):
+    from tests.fake_server import FakeServer
+
+    with FakeServer(mutation_delay=mutation_delay) as server:
+        connection.send(server.port)
+        # Waits for the stop command or the exit of the parent process.
+        try:
+            connection.recv()
+        except EOFError:
+            pass
+
+
+@contextmanager
+def fake_server(mutation_delay=0):
+    """
+    FakeServer in a child process, so that the server does not compete
+    with the measured client for the GIL and its memory is not traced.
+
+    :return: tuple : (host, port)
+    """
+    parent, child = multiprocessing.Pipe()
+    process = multiprocessing.Process(target=_serve, args=(child, mutation_delay), daemon=True)
+    process.start()
+    try:
+        yield "127.0.0.1", parent.recv()
+    finally:
+        parent.send(None)
+        process.join(5)
+        if process.is_alive():
+            process.terminate()
+
+
+def add_server_arguments(parser):
+    parser.add_argument(
+        "--host", default=None, help="ClickHouse server, by default a local FakeServer"
+    )
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--user", default="default")
+    parser.add_argument("--password", default="")
+
+
+@contextmanager
+def connect(args, **kwargs):
+    """
+    :param args: argparse.Namespace : with the arguments of add_server_arguments
+    :param kwargs: Parameters accepted by Client
+    :return: Client
+    """
+    if args.host:
+        client = Client(
+            args.host, port=args.port, user=args.user, password=args.password, **kwargs
+        )
+        try:
+            yield client
+        finally:
+            client.disconnect()
+        return
+
+    with fake_server() as (host, port):
+        client = Client(host, port=port, **kwargs)
+        try:
+            yield client
+        finally:
+            client.disconnect()
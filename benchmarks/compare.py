@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+Comparison of two results of the benchmarks saved with --output.
+
+    python -m benchmarks.compare before.json after.json
+    python -m benchmarks.compare before.json after.json --threshold 10
+
+The change is the ratio of the median time and of the peak memory
+of the second run to the first, > 1 means slower or larger.
+"""
+import argparse
+import json
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(before, after, threshold=5):
+    """
+    :param before: dict : loaded results
+    :param after: dict : loaded results
+    :param threshold: int, float : percent, smaller changes of time are not marked
+    :return: list(tuple) : [..., (name, p50 before, p50 after, time ratio, memory ratio, mark)]
+    """
+    rows = []
+    for name in sorted(set(before["results"]) | set(after["results"])):
+        old, new = before["results"].get(name), after["results"].get(name)
+        if old is None or new is None:
+            rows.append((name, old and old["p50"], new and new["p50"], None, None, "missing"))
+            continue
+        time_ratio = new["p50"] / old["p50"] if old["p50"] else None
+        memory_ratio = (
+            new["peak_memory_bytes"] / old["peak_memory_bytes"]
+            if old["peak_memory_bytes"]
+            else None
+        )
+        mark = ""
+        if time_ratio is not None and abs(time_ratio - 1) * 100 >= threshold:
+            mark = "slower" if time_ratio > 1 else "faster"
+        rows.append((name, old["p50"], new["p50"], time_ratio, memory_ratio, mark))
+    return rows
+
+
+def _format(value, template):
+    return template.format(value) if value is not None else "-"
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=5)
+    args = parser.parse_args()
+
+    before, after = load(args.before), load(args.after)
+    for label, data in (("before", before), ("after", after)):
+        environment = data["environment"]
+        print(
+            "{}: commit {}, python {}, {}".format(
+                label, environment["commit"], environment["python"], environment["date"]
+            )
+        )
+    print(
+        "{:<36} {:>10} {:>10} {:>8} {:>8}".format(
+            "benchmark", "before", "after", "time", "memory"
+        )
+    )
+    for name, old, new, time_ratio, memory_ratio, mark in compare(
+        before, after, args.threshold
+    ):
+        print(
+            "{:<36} {:>10} {:>10} {:>8} {:>8} {}".format(
+                name,
+                _format(old, "{:.4f}"),
+                _format(new, "{:.4f}"),
+                _format(time_ratio, "{:.2f}x"),
+                _format(memory_ratio, "{:.2f}x"),
+                mark,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Comparison of get_df from rows and get_df(columnar=True).
+
+    python -m benchmarks.get_df --rows 1000000
+    python -m benchmarks.get_df --rows 1000000 --host localhost
+
+Without --host, the result of the query is generated in memory and Client.execute
+is replaced, so only the creation of the DataFrame is measured.
+"""
+import argparse
+import datetime as dt
+from unittest import mock
+
+from benchmarks import common
+from clickhousepy import Client
+
+QUERY = (
+    "SELECT "
+    "toUInt32(number) AS id, "
+    "number / 3 AS value, "
+    "toDateTime('2021-01-01 00:00:00') + number AS dt, "
+    "toLowCardinality(toString(number % 10)) AS category, "
+    "if(number % 2, NULL, toInt64(number)) AS nullable "
+    "FROM numbers({})"
+)
+COLUMNS_TYPES = [
+    ("id", "UInt32"),
+    ("value", "Float64"),
+    ("dt", "DateTime"),
+    ("category", "LowCardinality(String)"),
+    ("nullable", "Nullable(Int64)"),
+]
+
+
+def generate_columns(rows):
+    start = dt.datetime(2021, 1, 1)
+    return [
+        tuple(range(rows)),
+        tuple(i / 3 for i in range(rows)),
+        tuple(start + dt.timedelta(seconds=i) for i in range(rows)),
+        tuple(str(i % 10) for i in range(rows)),
+        tuple(None if i % 2 else i for i in range(rows)),
+    ]
+
+
+def fake_execute(columns):
+    rows = list(zip(*columns))
+
+    def execute(self, query, *args, **kwargs):
+        if kwargs.get("columnar"):
+            return columns, COLUMNS_TYPES
+        if kwargs.get("with_column_types"):
+            return rows, COLUMNS_TYPES
+        return rows
+
+    return execute
+
+
+def run(client, rows, repeat):
+    import pandas  # noqa: F401 : the import time is not measured
+
+    query = QUERY.format(rows)
+    names = [name for name, _ in COLUMNS_TYPES]
+    results = {}
+    for name, func in (
+        ("rows", lambda: client.get_df(query, columns_names=names)),
+        ("columnar", lambda: client.get_df(query, columnar=True)),
+    ):
+        results[name] = common.measure(func, repeat, items=rows)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--host", default=None)
+    args = parser.parse_args()
+
+    if args.host:
+        results = run(Client(args.host), args.rows, args.repeat)
+    else:
+        execute = fake_execute(generate_columns(args.rows))
+        with mock.patch.object(Client, "execute", execute):
+            results = run(Client("localhost"), args.rows, args.repeat)
+
+    print("rows: {}".format(args.rows))
+    common.print_results(results)
+
+
+if __name__ == "__main__":
+    main()
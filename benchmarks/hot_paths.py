@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks of the hot paths: insert, select, get_df, copy_data and the SQL builders.
+
+    python -m benchmarks.hot_paths --output results.json
+    python -m benchmarks.hot_paths --suite insert --suite select --rows 500000
+    python -m benchmarks.hot_paths --host localhost --output results.json
+    python -m benchmarks.compare old.json results.json
+
+Without --host the queries are executed by a FakeServer started in a child process,
+so the results show the cost of the client, not of ClickHouse.
+The SQL builders are always measured with Client.execute replaced, without queries.
+"""
+import argparse
+import datetime as dt
+from importlib.util import find_spec
+from unittest import mock
+
+from benchmarks import common
+from benchmarks.get_df import fake_execute, generate_columns
+from clickhousepy import Client
+
+DB = "clickhousepy_benchmarks"
+TABLE = "data"
+COLUMNS = [
+    ("id", "UInt64"),
+    ("name", "String"),
+    ("date", "Date"),
+    ("value", "Float64"),
+    ("nullable", "Nullable(Int64)"),
+]
+SMALL_LIMIT = 100
+
+
+def generate_rows(rows):
+    start = dt.date(2021, 1, 1)
+    return [
+        (
+            i,
+            "name {}".format(i % 1000),
+            start + dt.timedelta(days=i % 365),
+            i / 3,
+            None if i % 2 else i,
+        )
+        for i in range(rows)
+    ]
+
+
+def create_table(client, table):
+    client.drop_table(DB, table)
+    return client.create_table_mergetree(
+        DB, table, columns=COLUMNS, orders=["id"], partition=["toYYYYMM(date)"]
+    )
+
+
+def bench_insert(client, args):
+    rows = generate_rows(args.rows)
+    columns = [list(i) for i in zip(*rows)]
+    table = create_table(client, TABLE + "_insert")
+    return {
+        "insert.rows": common.measure(
+            lambda: table.insert(rows), args.repeat, items=args.rows, setup=table.truncate
+        ),
+        "insert.columnar": common.measure(
+            lambda: table.insert(columns, columnar=True),
+            args.repeat,
+            items=args.rows,
+            setup=table.truncate,
+        ),
+    }
+
+
+def bench_select(client, args):
+    table = client.Table(DB, TABLE)
+    query = "SELECT * FROM {}.{}".format(DB, TABLE)
+    return {
+        # Small queries are dominated by the latency, so they are repeated more.
+        "select.small": common.measure(
+            lambda: table.select(limit=SMALL_LIMIT), args.repeat * 20, items=SMALL_LIMIT
+        ),
+        "select.large": common.measure(
+            lambda: client.execute(query), args.repeat, items=args.rows
+        ),
+        "select.large_columnar": common.measure(
+            lambda: client.execute(query, columnar=True), args.repeat, items=args.rows
+        ),
+    }
+
+
+def bench_get_df(client, args):
+    if not find_spec("pandas"):
+        print("pandas is not installed, get_df is skipped")
+        return {}
+
+    query = "SELECT * FROM {}.{}".format(DB, TABLE)
+    results = {
+        "get_df.rows": common.measure(
+            lambda: client.get_df(query), args.repeat, items=args.rows
+        ),
+        "get_df.columnar": common.measure(
+            lambda: client.get_df(query, columnar=True), args.repeat, items=args.rows
+        ),
+    }
+    # Only the creation of the DataFrame, the result is generated in memory.
+    execute = fake_execute(generate_columns(args.rows))
+    with mock.patch.object(Client, "execute", execute):
+        results["get_df.rows_without_query"] = common.measure(
+            lambda: client.get_df(query), args.repeat, items=args.rows
+        )
+        results["get_df.columnar_without_query"] = common.measure(
+            lambda: client.get_df(query, columnar=True), args.repeat, items=args.rows
+        )
+    return results
+
+
+def bench_copy_data(client, args):
+    target = TABLE + "_copy"
+
+    def drop_target():
+        client.drop_table(DB, target)
+
+    results = {
+        "copy_data": common.measure(
+            lambda: client.copy_data(DB, TABLE, DB, target),
+            args.repeat,
+            items=args.rows,
+            setup=drop_target,
+        ),
+        "copy_data.parallel": common.measure(
+            lambda: client.copy_data(DB, TABLE, DB, target, parallel="partition"),
+            args.repeat,
+            items=args.rows,
+            setup=drop_target,
+        ),
+    }
+    drop_target()
+    return results
+
+
+def bench_builders(client, args):
+    calls = args.builder_calls
+
+    def repeat_call(func):
+        def run():
+            for _ in range(calls):
+                func()
+
+        return run
+
+    columns = ["{} {}".format(name, type_) for name, type_ in COLUMNS]
+    with mock.patch.object(Client, "execute", lambda self, query, *a, **kw: []):
+        return {
+            "builders._generate_select": common.measure(
+                repeat_call(
+                    lambda: client._generate_select(
+                        DB, TABLE, 10, 0, ["id", "name"], "id > 10", "id"
+                    )
+                ),
+                args.repeat,
+                items=calls,
+            ),
+            "builders.create_table_mergetree": common.measure(
+                repeat_call(
+                    lambda: client.create_table_mergetree(
+                        DB,
+                        TABLE,
+                        columns,
+                        ["id"],
+                        ["toYYYYMM(date)"],
+                        settings="index_granularity = 8192",
+                    )
+                ),
+                args.repeat,
+                items=calls,
+            ),
+            "builders._alter_table_column": common.measure(
+                repeat_call(
+                    lambda: client._alter_table_column(
+                        DB, TABLE, "ADD", "new", "UInt32", after="id", codec="CODEC(ZSTD)"
+                    )
+                ),
+                args.repeat,
+                items=calls,
+            ),
+        }
+
+
+SUITES = {
+    "insert": bench_insert,
+    "select": bench_select,
+    "get_df": bench_get_df,
+    "copy_data": bench_copy_data,
+    "builders": bench_builders,
+}
+
+
+def run(client, args):
+    client.create_db(DB)
+    try:
+        table = create_table(client, TABLE)
+        table.insert(generate_rows(args.rows))
+        results = {}
+        for name in args.suite or list(SUITES):
+            results.update(SUITES[name](client, args))
+        return results
+    finally:
+        client.drop_db(DB)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--builder-calls", type=int, default=10000)
+    parser.add_argument(
+        "--suite", action="append", choices=list(SUITES), help="by default all suites"
+    )
+    parser.add_argument("--output", default=None, help="JSON file for the results")
+    common.add_server_arguments(parser)
+    args = parser.parse_args()
+
+    with common.connect(args) as client:
+        results = run(client, args)
+
+    common.print_results(results)
+    if args.output:
+        parameters = {
+            "rows": args.rows,
+            "repeat": args.repeat,
+            "builder_calls": args.builder_calls,
+            "server": args.host or "FakeServer",
+        }
+        common.save(args.output, parameters, results)
+        print("Results are saved to {}".format(args.output))
+
+
+if __name__ == "__main__":
+    main()
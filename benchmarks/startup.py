@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+Startup cost: import of clickhousepy, creation of Client, DB and Table,
+the first and the second query.
+
+    python -m benchmarks.startup --repeat 20 --output startup.json
+    python -m benchmarks.startup --host localhost
+
+Each sample is taken in a new Python process, so the imports are not cached.
+The peak memory is traced by one more process. The modules imported before
+the first query are listed, the driver, pandas, numpy and asyncio should not be there.
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+from benchmarks import common
+
+HEAVY_MODULES = ("clickhouse_driver", "pandas", "numpy", "asyncio", "multiprocessing")
+STAGES = ("import", "client", "first_query", "second_query")
+
+# Is executed by the new process, prints JSON with the seconds of the stages.
+CHILD = """
+import json, sys, time, tracemalloc
+host, port, user, password, trace = sys.argv[1:]
+if trace == "1":
+    tracemalloc.start()
+timings, peaks = {}, {}
+
+start = time.perf_counter()
+import clickhousepy
+timings["import"] = time.perf_counter() - start
+peaks["import"] = tracemalloc.get_traced_memory()[1] if trace == "1" else 0
+
+start = time.perf_counter()
+client = clickhousepy.Client(host, port=int(port), user=user, password=password)
+client.DB("default")
+client.Table("default", "t")
+timings["client"] = time.perf_counter() - start
+peaks["client"] = tracemalloc.get_traced_memory()[1] if trace == "1" else 0
+modules = [m for m in %r if m in sys.modules]
+
+for stage in ("first_query", "second_query"):
+    start = time.perf_counter()
+    client.execute("SELECT 1")
+    timings[stage] = time.perf_counter() - start
+    peaks[stage] = tracemalloc.get_traced_memory()[1] if trace == "1" else 0
+
+client.disconnect()
+print(json.dumps({"timings": timings, "peaks": peaks, "modules": modules}))
+""" % (
+    HEAVY_MODULES,
+)
+
+
+def sample(host, port, user, password, trace=False):
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD, host, str(port), user, password, "1" if trace else "0"],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run(host, port, user, password, repeat):
+    samples = [sample(host, port, user, password) for _ in range(repeat)]
+    traced = sample(host, port, user, password, trace=True)
+    results = {}
+    for stage in STAGES:
+        results["startup.{}".format(stage)] = common.summarize(
+            [i["timings"][stage] for i in samples], traced["peaks"][stage]
+        )
+    return results, traced["modules"]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--output", default=None, help="JSON file for the results")
+    common.add_server_arguments(parser)
+    args = parser.parse_args()
+
+    if args.host:
+        results, modules = run(args.host, args.port, args.user, args.password, args.repeat)
+    else:
+        with common.fake_server() as (host, port):
+            results, modules = run(host, port, "default", "", args.repeat)
+
+    common.print_results(results)
+    print("Modules imported before the first query: {}".format(", ".join(modules) or "-"))
+    if args.output:
+        parameters = {
+            "repeat": args.repeat,
+            "server": args.host or "FakeServer",
+            "modules_before_first_query": modules,
+        }
+        common.save(args.output, parameters, results)
+        print("Results are saved to {}".format(args.output))
+
+
+if __name__ == "__main__":
+    main()
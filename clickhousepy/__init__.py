@@ -4,4 +4,33 @@ __author__ = "Pavel Maksimov"
 __email__ = "vur21@ya.com"
 __version__ = "2021.1.23"
 
-from .clickhouse import Client
+from .clickhouse import (
+    DB,
+    Client,
+    InsertBlock,
+    InsertResult,
+    SliceResult,
+    SlicesError,
+    Table,
+)
+from .buffer import BufferedInserter, BufferedInsertError, BufferFullError
+from .bulk import BulkLoadError, BulkLoadResult
+from .files import ExportFile, LoadedFile
+from .metrics import Histogram, MetricsRegistry, QueryEvent
+from .mutations import (
+    MutationBatch,
+    MutationFailedError,
+    MutationStatus,
+    MutationTimeoutError,
+    MutationTracker,
+)
+from .pool import ConnectionPool, PoolTimeoutError
+
+
+def __getattr__(name):
+    # asyncio is imported only by the users of the asyncio client.
+    if name in ("AsyncClient", "AsyncDB", "AsyncTable"):
+        from . import aio
+
+        return getattr(aio, name)
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
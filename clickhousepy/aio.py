@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import functools
+import inspect
+from concurrent.futures import ThreadPoolExecutor
+
+from .clickhouse import DB, Client, Table
+
+
+class AsyncClient(object):
+    """
+    Asyncio version of Client. Each method is a coroutine with the same parameters.
+
+    The queries are executed by the connections of the client pool in a thread pool
+    of the same size, so any number of coroutines share pool_max_size connections
+    and threads, and do not block the event loop. Asynchronous iterators use a thread each.
+    """
+
+    def __init__(self, *args, client=None, executor=None, **kwargs):
+        """
+
+        :param args: Parameters accepted by Client
+        :param client: Client, None : use the pool of an existing client
+        :param executor: concurrent.futures.Executor, None : by default,
+            ThreadPoolExecutor with the number of threads equal to pool_max_size
+        :param kwargs: Parameters accepted by Client
+        """
+        # Only the client and the executor created here are closed by disconnect.
+        self._own_client = client is None
+        self._own_executor = executor is None
+        self._sync = client or Client(*args, **kwargs)
+        self._executor = executor or ThreadPoolExecutor(
+            max_workers=self._sync.pool.max_size,
+            thread_name_prefix="clickhousepy",
+        )
+
+    @property
+    def pool(self):
+        return self._sync.pool
+
+    def _wrap(self, result):
+        if isinstance(result, Table):
+            return AsyncTable(self, result.db, result.table)
+        elif isinstance(result, DB):
+            return AsyncDB(self, result.db)
+        return result
+
+    async def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(
+            self._executor, functools.partial(func, *args, **kwargs)
+        )
+        return self._wrap(result)
+
+    async def _iterate(self, iterator):
+        # The iterator holds a connection until the end. Its next() is executed
+        # in its own thread, so the iterators can be advanced while the threads
+        # of the executor wait for a connection held by them.
+        loop = asyncio.get_running_loop()
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="clickhousepy-iter")
+        end = object()
+        try:
+            while True:
+                item = await loop.run_in_executor(executor, next, iterator, end)
+                if item is end:
+                    break
+                yield item
+        finally:
+            executor.shutdown(wait=False)
+
+    async def _wait_mutations(self, db, table, sleep, **kwargs):
+        for interval in self._sync.mutation_tracker._intervals(sleep):
+            if not await self.get_count_run_mutations(db, table, **kwargs):
+                return
+            await asyncio.sleep(interval)
+
+    def DB(self, db):
+        return AsyncDB(self, db)
+
+    def Table(self, db, table):
+        return AsyncTable(self, db, table)
+
+    def pool_stats(self):
+        return self._sync.pool_stats()
+
+    def add_hook(self, before=None, after=None):
+        return self._sync.add_hook(before, after)
+
+    def remove_hook(self, handle):
+        return self._sync.remove_hook(handle)
+
+    def invalidate_metadata(self, db=None, table=None):
+        return self._sync.invalidate_metadata(db, table)
+
+    def result_cache_stats(self):
+        return self._sync.result_cache_stats()
+
+    def clear_result_cache(self):
+        return self._sync.clear_result_cache()
+
+    def buffered_inserter(self, *args, **kwargs):
+        """
+        Returns the usual BufferedInserter, the rows are inserted by its own thread.
+        Its methods block only when the buffer is full or during flush and close.
+        """
+        return self._sync.buffered_inserter(*args, **kwargs)
+
+
+    async def delete(
+        self, db, table, where, prevent_parallel_processes=False, sleep=1, **kwargs
+    ):
+        """
+        Waiting for the completion of mutations does not block the event loop.
+
+        :param db: str
+        :param table: str
+        :param where: str
+        :param prevent_parallel_processes: bool : The request will be made when all mutations on the table are complete.
+        :param sleep: int : The interval to check the completion of all mutations in the table.
+        :param kwargs: Parameters accepted by the clickhouse_driver library
+        :return:
+        """
+        if prevent_parallel_processes:
+            await self._wait_mutations(db, table, sleep, **kwargs)
+        return await self._run(self._sync.delete, db, table, where, **kwargs)
+
+    async def update(
+        self,
+        db,
+        table,
+        update,
+        where,
+        prevent_parallel_processes=False,
+        sleep=1,
+        **kwargs
+    ):
+        """
+        Waiting for the completion of mutations does not block the event loop.
+
+        :param db: str
+        :param table: str
+        :param update: str
+        :param where: str
+        :param prevent_parallel_processes: bool : The request will be made when all mutations on the table are complete.
+        :param sleep: int : The interval to check the completion of all mutations in the table.
+        :param kwargs: Parameters accepted by the clickhouse_driver library
+        :return:
+        """
+        if prevent_parallel_processes:
+            await self._wait_mutations(db, table, sleep, **kwargs)
+        return await self._run(self._sync.update, db, table, update, where, **kwargs)
+
+    def disconnect(self):
+        """
+        Closes the client and the executor, if they were created by AsyncClient,
+        the client and the executor passed to it are left open.
+        """
+        if self._own_executor:
+            self._executor.shutdown(wait=False)
+        if self._own_client:
+            self._sync.disconnect()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.disconnect()
+
+
+class AsyncDB(object):
+    def __init__(self, client, db):
+        self._client = client
+        self._sync = DB(client._sync, db)
+
+    def _run(self, func, *args, **kwargs):
+        return self._client._run(func, *args, **kwargs)
+
+    def _iterate(self, iterator):
+        return self._client._iterate(iterator)
+
+    @property
+    def db(self):
+        return self._sync.db
+
+    def invalidate_metadata(self):
+        return self._sync.invalidate_metadata()
+
+    def __repr__(self):
+        return str(self.db)
+
+    def __str__(self):
+        return str(self.db)
+
+
+class AsyncTable(object):
+    def __init__(self, client, db, table):
+        self._client = client
+        self._sync = Table(client._sync, db, table)
+
+    def _run(self, func, *args, **kwargs):
+        return self._client._run(func, *args, **kwargs)
+
+    def _iterate(self, iterator):
+        return self._client._iterate(iterator)
+
+    @property
+    def db(self):
+        return self._sync.db
+
+    @property
+    def table(self):
+        return self._sync.table
+
+    def invalidate_metadata(self):
+        return self._sync.invalidate_metadata()
+
+    def buffered_inserter(self, *args, **kwargs):
+        """
+        Returns the usual BufferedInserter, the rows are inserted by its own thread.
+        Its methods block only when the buffer is full or during flush and close.
+        """
+        return self._sync.buffered_inserter(*args, **kwargs)
+
+    async def delete(self, where, prevent_parallel_processes=False, sleep=1, **kwargs):
+        return await self._client.delete(
+            self.db, self.table, where, prevent_parallel_processes, sleep, **kwargs
+        )
+
+    async def update(
+        self, update, where, prevent_parallel_processes=False, sleep=1, **kwargs
+    ):
+        return await self._client.update(
+            self.db,
+            self.table,
+            update,
+            where,
+            prevent_parallel_processes,
+            sleep,
+            **kwargs
+        )
+
+    def __repr__(self):
+        return "{}.{}".format(self.db, self.table)
+
+    def __str__(self):
+        return "{}.{}".format(self.db, self.table)
+
+
+def _async_method(name, sync_method):
+    async def method(self, *args, **kwargs):
+        return await self._run(getattr(self._sync, name), *args, **kwargs)
+
+    method.__name__ = name
+    method.__qualname__ = name
+    method.__doc__ = sync_method.__doc__
+    return method
+
+
+def _async_iter_method(name, sync_method):
+    # Each next() is executed in the thread pool,
+    # so it is better to request rows in batches.
+    def method(self, *args, **kwargs):
+        return self._iterate(getattr(self._sync, name)(*args, **kwargs))
+
+    method.__name__ = name
+    method.__qualname__ = name
+    method.__doc__ = sync_method.__doc__
+    return method
+
+
+# Methods that return generators become asynchronous generators.
+ITERATOR_METHODS = ("select_iter", "select_pages", "get_df_iter", "select_df_iter")
+
+
+def _mirror_methods(async_cls, sync_cls, exclude=()):
+    """Adds coroutine versions of public methods of sync_cls which are not defined in async_cls."""
+    for name, sync_method in inspect.getmembers(sync_cls, inspect.isfunction):
+        if name.startswith("_") or name in exclude or name in async_cls.__dict__:
+            continue
+        if name in ITERATOR_METHODS:
+            setattr(async_cls, name, _async_iter_method(name, sync_method))
+        else:
+            setattr(async_cls, name, _async_method(name, sync_method))
+
+
+_mirror_methods(
+    AsyncClient, Client, exclude=("execute_iter", "from_url", "mutation_batch")
+)
+_mirror_methods(AsyncDB, DB)
+_mirror_methods(AsyncTable, Table, exclude=("mutation_batch",))
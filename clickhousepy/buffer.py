@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+import logging
+import threading
+import time
+
+from .clickhouse import _estimate_size
+
+
+class BufferFullError(Exception):
+    pass
+
+
+class BufferedInsertError(Exception):
+    def __init__(self, error):
+        super().__init__("Insertion from the buffer failed: {!r}".format(error))
+        self.error = error
+
+
+class BufferedInserter(object):
+    """
+    Accumulates rows in memory and inserts them in large blocks from a background thread,
+    so that frequent small insertions do not create many parts.
+
+    The buffer is flushed when one of the thresholds is reached:
+    the number of rows, the estimated size in bytes or the age of the oldest row.
+    If the insertion fails, the rows remain in the buffer, the thread stops
+    and the error is raised by the next call of insert, flush or close.
+    """
+
+    def __init__(
+        self,
+        client,
+        db,
+        table,
+        columns=None,
+        flush_rows=10000,
+        flush_bytes=None,
+        flush_interval=1,
+        max_buffer_rows=None,
+        timeout=None,
+        **kwargs
+    ):
+        """
+
+        :param client: Client
+        :param db: str
+        :param table: str
+        :param columns: list, tuple, None
+        :param flush_rows: int, None : flush when the buffer has this number of rows
+        :param flush_bytes: int, None : flush when the estimated size of the buffer reaches this number of bytes
+        :param flush_interval: int, float, None : flush rows that are in the buffer longer than this number of seconds
+        :param max_buffer_rows: int, None : back pressure, insert and add wait for free space
+            while the buffer has this number of rows, it is not the size of the inserted blocks,
+            by default 10 * flush_rows, None with flush_rows=None - no limit
+        :param timeout: int, float, None : how many seconds insert waits for free space in the buffer,
+            then raises BufferFullError, None - wait forever
+        :param kwargs: Parameters accepted by the clickhouse_driver library
+        """
+        self._client = client
+        self.db = db
+        self.table = table
+        self.columns = columns
+        self.flush_rows = flush_rows
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        if max_buffer_rows is None and flush_rows is not None:
+            max_buffer_rows = flush_rows * 10
+        self.max_buffer_rows = max_buffer_rows
+        self.timeout = timeout
+        self._kwargs = kwargs
+
+        self._cond = threading.Condition()
+        self._buffer = []
+        self._buffer_bytes = 0
+        self._first_row_time = None
+        self._flushing = False
+        self._flush_requested = False
+        self._closed = False
+        self._error = None
+        self._stats = {"inserted_rows": 0, "flushes": 0, "flush_seconds": 0.0}
+
+        self._thread = threading.Thread(
+            target=self._run,
+            name="BufferedInserter {}.{}".format(db, table),
+            daemon=True,
+        )
+        self._thread.start()
+
+    def _check_error(self):
+        if self._error is not None:
+            raise BufferedInsertError(self._error)
+
+    def _is_ready(self):
+        if not self._buffer:
+            return False
+        return (
+            self._closed
+            or self._flush_requested
+            or (self.flush_rows is not None and len(self._buffer) >= self.flush_rows)
+            or (self.flush_bytes is not None and self._buffer_bytes >= self.flush_bytes)
+            or (
+                self.flush_interval is not None
+                and time.monotonic() - self._first_row_time >= self.flush_interval
+            )
+        )
+
+    def _wait_time(self):
+        if self._buffer and self.flush_interval is not None:
+            return max(0, self._first_row_time + self.flush_interval - time.monotonic())
+        return None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._is_ready():
+                    if self._closed and not self._buffer:
+                        return
+                    self._cond.wait(self._wait_time())
+
+                rows, self._buffer = self._buffer, []
+                self._buffer_bytes, self._first_row_time = 0, None
+                self._flushing = True
+                # Wakes up the producers waiting for free space.
+                self._cond.notify_all()
+
+            start = time.monotonic()
+            try:
+                self._client.insert(self.db, self.table, rows, self.columns, **self._kwargs)
+            except Exception as e:
+                logging.error("Insertion from the buffer into {}.{} failed: {}".format(
+                    self.db, self.table, e
+                ))
+                with self._cond:
+                    self._error = e
+                    self._buffer = rows + self._buffer
+                    self._flushing = False
+                    self._cond.notify_all()
+                return
+
+            with self._cond:
+                self._stats["inserted_rows"] += len(rows)
+                self._stats["flushes"] += 1
+                self._stats["flush_seconds"] += time.monotonic() - start
+                self._flushing = False
+                self._cond.notify_all()
+
+    def insert(self, rows):
+        """
+        Adds rows to the buffer. If the buffer is full, waits until it is flushed.
+
+        :param rows: list, tuple, generator or other iterable of rows
+        """
+        rows = list(rows)
+        rows_bytes = sum(map(_estimate_size, rows)) if self.flush_bytes is not None else 0
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+
+        with self._cond:
+            if self._closed:
+                raise BufferedInsertError(Exception("Inserter is closed"))
+            while (
+                self.max_buffer_rows is not None
+                and len(self._buffer) >= self.max_buffer_rows
+                and self._error is None
+            ):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise BufferFullError(
+                        "Buffer of {}.{} is full: {} rows".format(
+                            self.db, self.table, len(self._buffer)
+                        )
+                    )
+                self._cond.wait(remaining)
+            self._check_error()
+
+            if not self._buffer:
+                self._first_row_time = time.monotonic()
+            self._buffer.extend(rows)
+            self._buffer_bytes += rows_bytes
+            self._cond.notify_all()
+
+    def add(self, row):
+        """
+        Adds one row to the buffer.
+
+        :param row: dict, list, tuple
+        """
+        self.insert([row])
+
+    def flush(self):
+        """Inserts all rows of the buffer and waits for the end of the insertion."""
+        with self._cond:
+            self._check_error()
+            self._flush_requested = True
+            self._cond.notify_all()
+            while (self._buffer or self._flushing) and self._error is None:
+                self._cond.wait()
+            self._flush_requested = False
+            self._check_error()
+
+    def close(self):
+        """Inserts the remaining rows and stops the thread."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+        self._check_error()
+
+    def stats(self):
+        """
+        :return: dict
+        """
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update(buffer_rows=len(self._buffer), buffer_bytes=self._buffer_bytes)
+        return stats
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __repr__(self):
+        return "BufferedInserter({}.{})".format(self.db, self.table)
@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+import io
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from .clickhouse import _blocks, _series_to_values
+
+# Connection of the worker process and the DataFrame or the path to the CSV file,
+# that the worker reads its slices from, are set by the pool initializer.
+_process_connection = None
+_process_source = None
+
+# Bytes read at once, when the CSV file is split into slices.
+_CSV_READ_SIZE = 2 ** 20
+
+
+class BulkLoadError(Exception):
+    def __init__(self, result):
+        super().__init__(
+            "{} of {} blocks were not inserted, first error in block {}: {!r}".format(
+                len(result.errors), result.blocks, *result.errors[0]
+            )
+        )
+        self.result = result
+
+
+class BulkLoadResult(object):
+    def __init__(self, rows, blocks, errors, seconds):
+        """
+
+        :param rows: int : number of inserted rows
+        :param blocks: int : number of blocks
+        :param errors: list(tuple) : [..., (block number, exception)] ordered by block number
+        :param seconds: float
+        """
+        self.rows = rows
+        self.blocks = blocks
+        self.errors = errors
+        self.seconds = seconds
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def __repr__(self):
+        return "BulkLoadResult(rows={}, blocks={}, errors={}, seconds={:.3f}, rows_per_second={:.0f})".format(
+            self.rows, self.blocks, len(self.errors), self.seconds, self.rows_per_second
+        )
+
+
+def _init_process(args, kwargs, source=None):
+    from clickhouse_driver import Client as ChClient
+
+    global _process_connection, _process_source
+    _process_connection = ChClient(*args, **kwargs)
+    _process_source = source
+
+
+def _insert_block(client, query, block, types_, kwargs):
+    """
+    Serializes and inserts one block.
+    In the process mode, client is None and the connection of the process is used.
+    """
+    client = client or _process_connection
+    if types_ is not None:
+        # DataFrame is converted into columns in the worker.
+        data = [_series_to_values(block[c], types_[c]) for c in block.columns]
+        return client.execute(query, data, columnar=True, **kwargs)
+    return client.execute(query, block, **kwargs)
+
+
+def _insert_slice(query, start, stop, columns, types_, kwargs):
+    """
+    Reads the slice of the source of the process and inserts it,
+    so the parent process does not serialize the blocks.
+
+    :param start: int : the first row of DataFrame or the first byte of the CSV file
+    :param stop: int
+    """
+    if isinstance(_process_source, str):
+        import pandas as pd  # pylint: disable=import-error
+
+        with open(_process_source, "rb") as f:
+            header = f.readline()
+            f.seek(start)
+            block = pd.read_csv(io.BytesIO(header + f.read(stop - start)))
+    else:
+        block = _process_source.iloc[start:stop]
+    return _insert_block(None, query, block[columns], types_, kwargs)
+
+
+def _iter_source(source, block_rows):
+    """
+    :return: generator of tuple (block, is DataFrame)
+    """
+    if isinstance(source, str):
+        import pandas as pd  # pylint: disable=import-error
+
+        for chunk in pd.read_csv(source, chunksize=block_rows):
+            yield chunk, True
+    elif _is_dataframe(source):
+        for start in range(0, len(source), block_rows):
+            yield source.iloc[start : start + block_rows], True
+    else:
+        for block, _ in _blocks(source, chunk_rows=block_rows):
+            yield block, False
+
+
+def _iter_slices(source, block_rows):
+    """
+    Slices of the source, that are read by the worker processes.
+
+    :return: generator of tuple (start, stop) : rows of DataFrame or bytes of the CSV file
+    """
+    if not isinstance(source, str):
+        for start in range(0, len(source), block_rows):
+            yield start, min(start + block_rows, len(source))
+        return
+
+    # Only the line breaks are counted, the file is parsed by the workers.
+    with open(source, "rb") as f:
+        f.readline()
+        start = position = f.tell()
+        lines = 0
+        while True:
+            data = f.read(_CSV_READ_SIZE)
+            if not data:
+                break
+            offset = 0
+            while True:
+                if lines + data.count(b"\n", offset) < block_rows:
+                    lines += data.count(b"\n", offset)
+                    break
+                # The end of the slice is in this piece.
+                for _ in range(block_rows - lines):
+                    offset = data.index(b"\n", offset) + 1
+                yield start, position + offset
+                start, lines = position + offset, 0
+            position += len(data)
+    if position > start:
+        yield start, position
+
+
+def _is_dataframe(source):
+    return hasattr(source, "iloc") and hasattr(source, "columns")
+
+
+def _insert_columns(client, db, table, columns):
+    """
+    Checks the columns of DataFrame or CSV file as insert_df does.
+
+    :return: tuple : (types of the inserted columns, inserted columns)
+    """
+    columns_data = client.describe(db, table)
+    types_ = {i[0]: i[1] for i in columns_data if i[2] not in ("ALIAS", "MATERIALIZED")}
+    skipped = {i[0] for i in columns_data if i[2] in ("ALIAS", "MATERIALIZED")}
+
+    missing = [c for c in columns if c not in types_ and c not in skipped]
+    if missing:
+        raise Exception("Columns {} are missing in table {}.{}".format(missing, db, table))
+    return types_, [c for c in columns if c in types_]
+
+
+def bulk_load(
+    client,
+    db,
+    table,
+    source,
+    columns=None,
+    workers=4,
+    mode="thread",
+    block_rows=100000,
+    raise_on_error=True,
+    **kwargs
+):
+    """
+    Parallel insertion of blocks over several connections.
+
+    :param client: Client
+    :param db: str
+    :param table: str
+    :param source: iterable of rows, DataFrame or path to CSV file with header
+    :param columns: list, tuple, None : column names of the rows, for DataFrame and CSV the columns are taken from them
+    :param workers: int : number of simultaneous insertions
+    :param mode: str : thread - connections of the client pool,
+        process - worker processes with their own connections,
+        the data is serialized in parallel without the GIL.
+        The workers read the slices of DataFrame and CSV file themselves,
+        the CSV file is split by line breaks, so its values must not contain them.
+        The blocks of other iterables are sent to the workers.
+    :param block_rows: int
+    :param raise_on_error: bool : raise BulkLoadError after loading if some blocks were not inserted
+    :param kwargs: Parameters accepted by the clickhouse_driver library
+    :return: BulkLoadResult
+    """
+    if mode not in ("thread", "process"):
+        raise ValueError("Mode can be thread or process, not {}".format(mode))
+
+    is_dataframe = isinstance(source, str) or _is_dataframe(source)
+    if is_dataframe:
+        if isinstance(source, str):
+            import pandas as pd  # pylint: disable=import-error
+
+            source_columns = list(pd.read_csv(source, nrows=0).columns)
+        else:
+            source_columns = list(source.columns)
+        types_, columns = _insert_columns(client, db, table, source_columns)
+        query = "INSERT INTO {}.{} ({}) VALUES".format(db, table, ",".join(columns))
+    else:
+        types_ = None
+        columns_str = "({})".format(",".join(columns)) if columns else ""
+        query = "INSERT INTO {}.{} {} VALUES".format(db, table, columns_str)
+
+    if mode == "thread":
+        executor = ThreadPoolExecutor(max_workers=workers)
+        # The queries of the threads are tagged with bulk_load.
+        insert_block = client._in_context(_insert_block)
+        tasks = (
+            (
+                insert_block,
+                client,
+                query,
+                block[columns] if is_dataframe else block,
+                types_,
+                kwargs,
+            )
+            for block, _ in _iter_source(source, block_rows)
+        )
+    else:
+        # Imports multiprocessing, which is not needed for the thread mode.
+        from concurrent.futures import ProcessPoolExecutor
+
+        # DataFrame and CSV are read by the workers, the rows of an iterable are sent to them.
+        executor = ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_process,
+            initargs=(client._args, client._kwargs, source if is_dataframe else None),
+        )
+        if is_dataframe:
+            tasks = (
+                (_insert_slice, query, start, stop, columns, types_, kwargs)
+                for start, stop in _iter_slices(source, block_rows)
+            )
+        else:
+            tasks = (
+                (_insert_block, None, query, block, None, kwargs)
+                for block, _ in _iter_source(source, block_rows)
+            )
+
+    rows, blocks, errors = 0, 0, []
+    pending = {}
+    start = time.monotonic()
+
+    def collect(futures):
+        nonlocal rows
+        for future in futures:
+            number = pending.pop(future)
+            try:
+                rows += future.result()
+            except Exception as e:
+                logging.error("Block {} was not inserted into {}.{}: {!r}".format(
+                    number, db, table, e
+                ))
+                errors.append((number, e))
+
+    with executor:
+        for task in tasks:
+            # Limits the number of blocks in memory.
+            if len(pending) >= workers * 2:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+
+            future = executor.submit(*task)
+            pending[future] = blocks
+            blocks += 1
+
+        collect(list(pending))
+
+    errors.sort(key=lambda i: i[0])
+    result = BulkLoadResult(rows, blocks, errors, time.monotonic() - start)
+    logging.info("Bulk load into {}.{}: {}".format(db, table, result))
+
+    if errors and raise_on_error:
+        raise BulkLoadError(result)
+    return result
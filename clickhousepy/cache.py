@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import logging
+import os
+import pickle
+import re
+import threading
+import time
+from collections import OrderedDict
+
+# String literals and quoted identifiers are not normalized.
+_QUOTED = re.compile(r"""('(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*"|`(?:[^`\\]|\\.)*`)""")
+
+
+def _normalize_sql(query):
+    """Collapses whitespace outside of quotes, so that differently formatted queries have one key."""
+    parts = _QUOTED.split(query)
+    for i in range(0, len(parts), 2):
+        parts[i] = re.sub(r"\s+", " ", parts[i])
+    return "".join(parts).strip()
+
+
+def _sizeof(value):
+    """Approximate size of the result in bytes."""
+    if hasattr(value, "memory_usage"):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def _copy(value):
+    # DataFrames are mutable, so the cache gives out copies.
+    return value.copy() if hasattr(value, "memory_usage") else value
+
+
+class MetadataCache(object):
+    """
+    Cache of table metadata: describe, exists, show_tables, show_create_table.
+
+    Entries live ttl seconds, when there are more than max_size entries
+    the least recently used are removed. The DDL methods of the client
+    invalidate the entries of the changed tables, queries executed
+    by execute are not tracked, use Client.invalidate_metadata for them.
+    """
+
+    def __init__(self, ttl=60, max_size=1024):
+        """
+
+        :param ttl: int, float : seconds
+        :param max_size: int : maximum number of entries
+        """
+        self.ttl = ttl
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._stats = {"hits": 0, "misses": 0}
+
+    def get(self, key):
+        """
+        :param key: tuple : (method name, db, table, ...)
+        :return: tuple : (found, value)
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                self._entries.pop(key, None)
+                self._stats["misses"] += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return True, entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, db=None, table=None):
+        """
+        Removes the entries of the table, of all tables of the database
+        or all entries if db is None. The lists of tables of the database are removed too.
+
+        :param db: str, None
+        :param table: str, None
+        """
+        with self._lock:
+            if db is None:
+                self._entries.clear()
+                return
+            for key in list(self._entries):
+                key_db, key_table = key[1], key[2]
+                if key_db is None or (
+                    key_db == db and (table is None or key_table in (table, None))
+                ):
+                    del self._entries[key]
+
+    def stats(self):
+        """
+        :return: dict
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+        return stats
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class ResultCache(object):
+    """
+    Cache of query results limited by the size in memory.
+
+    When the results do not fit in max_bytes, the least recently used are removed,
+    with spill_dir they are saved to files on disk instead, up to spill_max_bytes.
+    """
+
+    def __init__(self, max_bytes, ttl=None, spill_dir=None, spill_max_bytes=None):
+        """
+
+        :param max_bytes: int : maximum size of the results in memory
+        :param ttl: int, float, None : seconds, used when the call does not set its own TTL,
+            None - only the calls with cache_ttl are cached
+        :param spill_dir: str, None : directory for the results removed from memory
+        :param spill_max_bytes: int, None : maximum size of the files, by default 10 * max_bytes
+        """
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.spill_dir = spill_dir
+        self.spill_max_bytes = spill_max_bytes or max_bytes * 10
+        if spill_dir is not None:
+            os.makedirs(spill_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        # key: (expires, size, value)
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        # key: (expires, size, path)
+        self._disk = OrderedDict()
+        self._disk_bytes = 0
+        self._stats = {"hits": 0, "disk_hits": 0, "misses": 0}
+
+    @staticmethod
+    def key(method, query, kwargs, *extra):
+        """
+        :param method: str
+        :param query: str
+        :param kwargs: dict : parameters of the clickhouse_driver library, query_id is ignored
+        :param extra: parameters of the method that change the result
+        :return: tuple
+        """
+        kwargs = {k: v for k, v in kwargs.items() if k != "query_id"}
+        return (method, _normalize_sql(query), repr(sorted(kwargs.items())), repr(extra))
+
+    def get(self, key):
+        """
+        :param key: tuple
+        :return: tuple : (found, value)
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[0] >= now:
+                    self._memory.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return True, _copy(entry[2])
+                self._pop_memory(key)
+
+            entry = self._disk.get(key)
+            if entry is not None:
+                if entry[0] >= now:
+                    try:
+                        with open(entry[2], "rb") as f:
+                            value = pickle.load(f)
+                    except (OSError, pickle.UnpicklingError, EOFError) as e:
+                        logging.warning("Failed to read cached result {}: {}".format(entry[2], e))
+                    else:
+                        self._pop_disk(key)
+                        self._put_memory(key, entry[0], entry[1], value)
+                        self._stats["disk_hits"] += 1
+                        return True, _copy(value)
+                self._pop_disk(key)
+
+            self._stats["misses"] += 1
+            return False, None
+
+    def set(self, key, value, ttl=None):
+        """
+        :param key: tuple
+        :param value: result
+        :param ttl: int, float, None : by default the TTL of the cache
+        """
+        ttl = self.ttl if ttl is None else ttl
+        if not ttl:
+            return
+        size = _sizeof(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._pop_memory(key)
+            self._pop_disk(key)
+            self._put_memory(key, time.monotonic() + ttl, size, _copy(value))
+
+    def _put_memory(self, key, expires, size, value):
+        self._memory[key] = (expires, size, value)
+        self._memory_bytes += size
+        while self._memory_bytes > self.max_bytes:
+            old_key, (old_expires, old_size, old_value) = self._memory.popitem(last=False)
+            self._memory_bytes -= old_size
+            if self.spill_dir is not None and old_expires >= time.monotonic():
+                self._spill(old_key, old_expires, old_size, old_value)
+
+    def _spill(self, key, expires, size, value):
+        path = os.path.join(
+            self.spill_dir, hashlib.sha1(repr(key).encode()).hexdigest() + ".pickle"
+        )
+        try:
+            with open(path, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        except (OSError, pickle.PicklingError) as e:
+            logging.warning("Failed to save cached result to {}: {}".format(path, e))
+            return
+        self._disk[key] = (expires, size, path)
+        self._disk_bytes += size
+        while self._disk_bytes > self.spill_max_bytes:
+            self._pop_disk(next(iter(self._disk)))
+
+    def _pop_memory(self, key):
+        entry = self._memory.pop(key, None)
+        if entry is not None:
+            self._memory_bytes -= entry[1]
+
+    def _pop_disk(self, key):
+        entry = self._disk.pop(key, None)
+        if entry is not None:
+            self._disk_bytes -= entry[1]
+            try:
+                os.remove(entry[2])
+            except OSError:
+                pass
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            for key in list(self._disk):
+                self._pop_disk(key)
+
+    def stats(self):
+        """
+        :return: dict
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update(
+                memory_entries=len(self._memory),
+                memory_bytes=self._memory_bytes,
+                disk_entries=len(self._disk),
+                disk_bytes=self._disk_bytes,
+            )
+        return stats
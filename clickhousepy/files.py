@@ -0,0 +1,925 @@
+# -*- coding: utf-8 -*-
+import ast
+import csv
+import datetime as dt
+import decimal
+import glob
+import io
+import ipaddress
+import logging
+import os
+import queue
+import re
+import threading
+import time
+import uuid
+from collections import namedtuple
+
+from .clickhouse import SlicesError, _chunks, _unwrap_type
+
+ExportFile = namedtuple("ExportFile", ["path", "rows", "bytes"])
+LoadedFile = namedtuple("LoadedFile", ["path", "rows", "blocks", "seconds"])
+
+FORMATS = ("csv", "tsv", "parquet", "native")
+COMPRESSIONS = {".gz": "gzip", ".bz2": "bz2", ".xz": "xz"}
+
+_INTEGER_TYPES = (
+    "Int8", "Int16", "Int32", "Int64", "UInt8", "UInt16", "UInt32", "UInt64"
+)
+_DECIMAL_PRECISION = {"Decimal32": 9, "Decimal64": 18, "Decimal128": 38, "Decimal256": 76}
+_TSV_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+_QUOTED_ESCAPES = str.maketrans({"\\": "\\\\", "'": "\\'"})
+_TSV_UNESCAPES = {"t": "\t", "n": "\n", "r": "\r", "0": "\0", "b": "\b", "f": "\f"}
+_TSV_ESCAPE_RE = re.compile(r"\\(.)")
+# The parameters of export, that are not passed to the driver.
+_EXPORT_PARAMETERS = ("compression", "block_rows", "max_file_rows", "max_file_bytes", "header")
+
+
+def _file_compression(path):
+    """data.csv.gz -> gzip"""
+    return COMPRESSIONS.get(os.path.splitext(path)[1].lower())
+
+
+def _file_format(path, format_=None):
+    """data.csv.gz -> csv"""
+    if format_ is None:
+        root, ext = os.path.splitext(path)
+        if ext.lower() in COMPRESSIONS:
+            root, ext = os.path.splitext(root)
+        format_ = ext[1:]
+    format_ = format_.lower()
+    if format_ not in FORMATS:
+        raise ValueError(
+            "Format can be {}, not {!r}".format(", ".join(FORMATS), format_)
+        )
+    return format_
+
+
+def _with_placeholder(path, placeholder):
+    """data.csv.gz, _{part} -> data_{part}.csv.gz"""
+    directory, name = os.path.split(path)
+    dot = name.find(".", 1)
+    if dot == -1:
+        name += placeholder
+    else:
+        name = name[:dot] + placeholder + name[dot:]
+    return os.path.join(directory, name)
+
+
+def _text_value(value, quote=False):
+    """Value in the text form of ClickHouse, quote - inside an array, tuple or map."""
+    if value is None:
+        return "NULL" if quote else "\\N"
+    elif isinstance(value, bool):
+        return "true" if value else "false"
+    elif isinstance(value, str):
+        return "'{}'".format(value.translate(_QUOTED_ESCAPES)) if quote else value
+    elif isinstance(value, dt.datetime):
+        value = value.replace(tzinfo=None).isoformat(" ")
+        return "'{}'".format(value) if quote else value
+    elif isinstance(
+        value, (dt.date, uuid.UUID, ipaddress.IPv4Address, ipaddress.IPv6Address)
+    ):
+        return "'{}'".format(value) if quote else str(value)
+    elif isinstance(value, list):
+        return "[{}]".format(",".join(_text_value(i, True) for i in value))
+    elif isinstance(value, tuple):
+        return "({})".format(",".join(_text_value(i, True) for i in value))
+    elif isinstance(value, dict):
+        return "{{{}}}".format(
+            ",".join(
+                "{}:{}".format(_text_value(k, True), _text_value(v, True))
+                for k, v in value.items()
+            )
+        )
+    elif isinstance(value, bytes):
+        return _text_value(value.decode("utf-8", "replace"), quote)
+    return str(value)
+
+
+def _text_formatter(type_, escape=None):
+    """
+    Formatting of the values of the column for CSV and TSV.
+
+    :param type_: str : ClickHouse type
+    :param escape: function, None : escaping of the text for TSV,
+        None - CSV, the quoting is done by the csv module
+    :return: function, None : value -> str, None - the value is written as is
+    """
+    type_, _ = _unwrap_type(type_, "LowCardinality")
+    type_, nullable = _unwrap_type(type_, "Nullable")
+    if type_ in _INTEGER_TYPES or type_.startswith("Float"):
+        # The csv module itself converts numbers to str.
+        format_ = str if escape else None
+    elif type_.startswith(("String", "FixedString", "Enum")):
+        format_ = escape
+    elif escape is None:
+        return _text_value
+    else:
+        return lambda value: "\\N" if value is None else escape(_text_value(value))
+
+    if nullable:
+        format_ = format_ or str
+        return lambda value: "\\N" if value is None else format_(value)
+    return format_
+
+
+def _is_string_type(type_):
+    type_, _ = _unwrap_type(type_, "LowCardinality")
+    type_, _ = _unwrap_type(type_, "Nullable")
+    return type_.startswith(("String", "FixedString", "Enum"))
+
+
+def _literal(text):
+    """[1,NULL,'a'] -> [1, None, 'a']"""
+    try:
+        return ast.literal_eval(re.sub(r"\bNULL\b", "None", text))
+    except (ValueError, SyntaxError):
+        raise ValueError("Value {!r} is not an array, tuple or map".format(text))
+
+
+def _text_parser(type_):
+    """
+    Parsing of the text of CSV and TSV into the value of the column type,
+    \\N is NULL, an empty field of not string types too.
+
+    :param type_: str : ClickHouse type
+    :return: function : str -> value
+    """
+    if _is_string_type(type_):
+        return lambda value: None if value == "\\N" else value
+
+    type_, _ = _unwrap_type(type_, "LowCardinality")
+    type_, _ = _unwrap_type(type_, "Nullable")
+    if type_ in _INTEGER_TYPES:
+        parse = int
+    elif type_.startswith("Float"):
+        parse = float
+    elif type_.startswith("Decimal"):
+        parse = decimal.Decimal
+    elif type_ == "Bool":
+        def parse(value):
+            return value.lower() in ("true", "1")
+    elif type_ in ("Date", "Date32"):
+        parse = dt.date.fromisoformat
+    elif type_.startswith("DateTime"):
+        parse = dt.datetime.fromisoformat
+    elif type_ == "UUID":
+        parse = uuid.UUID
+    elif type_.startswith("Array("):
+        parse_item = _text_parser(type_[len("Array(") : -1])
+
+        def parse(value):
+            # The strings inside the array are converted, like the dates.
+            return [
+                parse_item(i) if isinstance(i, str) else i for i in _literal(value)
+            ]
+    elif type_.startswith(("Tuple(", "Map(")):
+        parse = _literal
+    else:
+        parse = str
+
+    return lambda value: None if value in ("\\N", "") else parse(value)
+
+
+def _arrow_type(pa, type_):
+    """
+    Matching the ClickHouse column type to the Arrow type.
+    Types without an Arrow equivalent are written as strings in the text form of ClickHouse.
+
+    :param pa: module pyarrow
+    :param type_: str : ClickHouse type
+    :return: tuple : (Arrow type, function converting not NULL values or None)
+    """
+    type_, _ = _unwrap_type(type_, "LowCardinality")
+    type_, _ = _unwrap_type(type_, "Nullable")
+    if type_ in _INTEGER_TYPES:
+        return getattr(pa, type_.lower())(), None
+    elif type_ in ("Float32", "Float64"):
+        return getattr(pa, type_.lower())(), None
+    elif type_ == "Bool":
+        return pa.bool_(), None
+    elif type_.startswith(("String", "FixedString", "Enum")):
+        return pa.string(), None
+    elif type_ in ("Date", "Date32"):
+        return pa.date32(), None
+    elif type_.startswith("DateTime"):
+        timezone = re.search(r"'([^']*)'", type_)
+        precision = re.match(r"DateTime64\((\d+)", type_)
+        if precision is None:
+            unit = "s"
+        else:
+            # Python datetime has microsecond precision.
+            unit = "ms" if int(precision.group(1)) <= 3 else "us"
+        return pa.timestamp(unit, tz=timezone and timezone.group(1)), None
+    elif type_.startswith("Decimal"):
+        match = re.match(r"(Decimal\d*)\((\d+)(?:,\s*(\d+))?\)", type_)
+        if match.group(1) == "Decimal":
+            precision, scale = int(match.group(2)), int(match.group(3) or 0)
+        else:
+            precision, scale = _DECIMAL_PRECISION[match.group(1)], int(match.group(2))
+        decimal_type = pa.decimal128 if precision <= 38 else pa.decimal256
+        return decimal_type(precision, scale), None
+    elif type_.startswith("Array("):
+        item_type, convert = _arrow_type(pa, type_[len("Array(") : -1])
+        if convert is not None:
+            return pa.list_(item_type), lambda value: [
+                None if i is None else convert(i) for i in value
+            ]
+        return pa.list_(item_type), None
+    elif type_ in ("UUID", "IPv4", "IPv6"):
+        return pa.string(), str
+    return pa.string(), _text_value
+
+
+def _native_context(timezone):
+    """
+    Context of the driver for the Native format: without block info,
+    naive DateTime values are in the timezone of the server, as they were received.
+    """
+    from clickhouse_driver import defines
+    from clickhouse_driver.connection import ServerInfo
+    from clickhouse_driver.context import Context
+
+    context = Context()
+    context.settings = {}
+    context.client_settings = {
+        "strings_as_bytes": False,
+        "strings_encoding": defines.STRINGS_ENCODING,
+        "use_numpy": False,
+        "input_format_null_as_default": False,
+        "namedtuple_as_json": False,
+    }
+    context.server_info = ServerInfo("ClickHouse", 0, 0, 0, 0, timezone, "", 0)
+    return context
+
+
+def _server_timezone(client):
+    with client.pool.connection() as conn:
+        if not conn.connection.connected:
+            conn.connection.connect()
+        return conn.connection.server_info.get_timezone()
+
+
+class _FileSocket(object):
+    """File with the socket interface of the buffered reader and writer of the driver."""
+
+    def __init__(self, f):
+        self.f = f
+
+    def sendall(self, data):
+        self.f.write(data)
+
+    def recv_into(self, buffer):
+        return self.f.readinto(buffer)
+
+
+class _MappedFile(object):
+    """Memory-mapped file, the data is copied from the page cache without read calls."""
+
+    def __init__(self, path):
+        import mmap
+
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.data = memoryview(self.map)
+        self.position = 0
+
+    def readinto(self, buffer):
+        chunk = self.data[self.position : self.position + len(buffer)]
+        buffer[: len(chunk)] = chunk
+        self.position += len(chunk)
+        return len(chunk)
+
+    def close(self):
+        self.data.release()
+        self.map.close()
+
+
+class _TextWriter(object):
+    def __init__(self, stream, columns_with_types, format_, header):
+        self.text = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+        if format_ == "csv":
+            self.csv = csv.writer(self.text, lineterminator="\n")
+            escape = None
+        else:
+            self.csv = None
+
+            def escape(value):
+                return value.translate(_TSV_ESCAPES)
+
+        formatters = [_text_formatter(type_, escape) for _, type_ in columns_with_types]
+        # Rows of numbers and strings are written to CSV without copying.
+        self.formatters = (
+            [i or _identity for i in formatters] if any(formatters) else None
+        )
+        if header:
+            names = [name for name, _ in columns_with_types]
+            self.write([names], formatters=[escape or _identity] * len(names))
+
+    def write(self, rows, formatters=None):
+        formatters = formatters or self.formatters
+        if formatters is not None:
+            rows = ([f(v) for f, v in zip(formatters, row)] for row in rows)
+        if self.csv is not None:
+            self.csv.writerows(rows)
+        else:
+            self.text.write("".join("\t".join(row) + "\n" for row in rows))
+
+    def close(self):
+        # The file is closed by _Output.
+        self.text.detach()
+
+
+class _NativeWriter(object):
+    def __init__(self, stream, columns_with_types, timezone):
+        from clickhouse_driver import defines
+        from clickhouse_driver.bufferedwriter import BufferedSocketWriter
+        from clickhouse_driver.streams.native import BlockOutputStream
+
+        self.columns_with_types = columns_with_types
+        self.output = BlockOutputStream(
+            BufferedSocketWriter(_FileSocket(stream), defines.BUFFER_SIZE),
+            _native_context(timezone),
+        )
+
+    def write(self, rows):
+        from clickhouse_driver.block import ColumnOrientedBlock
+
+        columns = [list(i) for i in zip(*rows)]
+        # The block is flushed to the file by the stream.
+        self.output.write(ColumnOrientedBlock(self.columns_with_types, columns))
+
+    def close(self):
+        pass
+
+
+class _ParquetWriter(object):
+    def __init__(self, stream, columns_with_types, compression):
+        import pyarrow as pa  # pylint: disable=import-error
+        import pyarrow.parquet as pq  # pylint: disable=import-error
+
+        self.pa = pa
+        self.types = [_arrow_type(pa, type_) for _, type_ in columns_with_types]
+        self.schema = pa.schema(
+            [
+                pa.field(name, arrow_type)
+                for (name, _), (arrow_type, _) in zip(columns_with_types, self.types)
+            ]
+        )
+        self.writer = pq.ParquetWriter(
+            stream, self.schema, compression=compression or "snappy"
+        )
+
+    def write(self, rows):
+        # One block is one row group.
+        arrays = []
+        for values, (arrow_type, convert) in zip(zip(*rows), self.types):
+            if convert is not None:
+                values = [None if v is None else convert(v) for v in values]
+            arrays.append(self.pa.array(values, type=arrow_type))
+        self.writer.write_table(self.pa.Table.from_arrays(arrays, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+def _identity(value):
+    return value
+
+
+def _compressed(f, compression, mode="wb"):
+    if compression is None:
+        return f
+    elif compression == "gzip":
+        import gzip
+
+        # As the gzip utility, level 9 is several times slower.
+        return gzip.GzipFile(fileobj=f, mode=mode, compresslevel=6)
+    elif compression == "bz2":
+        import bz2
+
+        return bz2.BZ2File(f, mode)
+    import lzma
+
+    return lzma.LZMAFile(f, mode)
+
+
+def _check_compression(compression):
+    if compression is not None and compression not in COMPRESSIONS.values():
+        raise ValueError(
+            "Compression can be {}, not {!r}".format(
+                ", ".join(COMPRESSIONS.values()), compression
+            )
+        )
+
+
+class _Output(object):
+    """One file of the export."""
+
+    def __init__(self, path, format_, columns_with_types, compression, header, timezone):
+        self.path = path
+        self.rows = 0
+        self.file = open(path, "wb")
+        try:
+            if format_ == "parquet":
+                self.stream = self.file
+                self.writer = _ParquetWriter(self.file, columns_with_types, compression)
+            else:
+                self.stream = _compressed(self.file, compression)
+                if format_ == "native":
+                    self.writer = _NativeWriter(self.stream, columns_with_types, timezone)
+                else:
+                    self.writer = _TextWriter(
+                        self.stream, columns_with_types, format_, header
+                    )
+        except BaseException:
+            self.file.close()
+            raise
+
+    @property
+    def bytes(self):
+        """Written bytes, without the data in the buffers of the compression."""
+        return self.file.tell()
+
+    def write(self, rows):
+        self.writer.write(rows)
+        self.rows += len(rows)
+
+    def close(self):
+        try:
+            self.writer.close()
+            if self.stream is not self.file:
+                self.stream.close()
+        finally:
+            self.file.close()
+        result = ExportFile(self.path, self.rows, os.path.getsize(self.path))
+        logging.info("Exported {} rows to {}".format(result.rows, result.path))
+        return result
+
+    def discard(self):
+        """Closes and deletes the file, that was not written to the end."""
+        try:
+            self.writer.close()
+            if self.stream is not self.file:
+                self.stream.close()
+        except Exception:
+            pass
+        finally:
+            self.file.close()
+            os.remove(self.path)
+        logging.warning(
+            "Export to {} failed, the incomplete file is deleted".format(self.path)
+        )
+
+
+def export(
+    client,
+    query,
+    path,
+    format=None,
+    compression=None,
+    block_rows=65536,
+    max_file_rows=None,
+    max_file_bytes=None,
+    header=True,
+    **kwargs
+):
+    """
+    Streaming export of the query result to files.
+    The server sends the result in blocks of block_rows rows, only one block is kept in memory.
+
+    :param client: Client
+    :param query: str
+    :param path: str : with the {part} placeholder for the rotation,
+        if it is not there, _{part:04d} is added before the extension
+    :param format: str, None : csv, tsv, parquet, native (ClickHouse Native),
+        None - by the extension of path
+    :param compression: str, None : gzip, bz2, xz, for parquet the codec of pyarrow,
+        None - by the extension of path, for parquet snappy,
+        the path of parquet can not have the extension of a compression
+    :param block_rows: int
+    :param max_file_rows: int, None : the next file is started after this number of rows
+    :param max_file_bytes: int, None : the next file is started after the block
+        with which the file has become larger
+    :param header: bool : the column names in the first line of csv and tsv
+    :param kwargs: Parameters accepted by the clickhouse_driver library
+    :return: list(ExportFile) : [..., (path, rows, bytes)]
+    """
+    format_ = _file_format(path, format)
+    if format_ != "parquet":
+        compression = compression or _file_compression(path)
+        _check_compression(compression)
+    elif _file_compression(path):
+        # The codec of parquet compresses the columns inside the file,
+        # the file itself is not compressed.
+        raise ValueError(
+            "Parquet file can not be compressed by {}, "
+            "the codec of parquet is passed by compression: {}".format(
+                _file_compression(path), path
+            )
+        )
+
+    rotate = bool(max_file_rows or max_file_bytes)
+    if rotate and "{part" not in path:
+        path = _with_placeholder(path, "_{part:04d}")
+    timezone = _server_timezone(client) if format_ == "native" else None
+
+    settings = dict(kwargs.pop("settings", None) or {})
+    settings.setdefault("max_block_size", block_rows)
+    rows = client.execute_iter(
+        query, with_column_types=True, settings=settings, **kwargs
+    )
+    # The first element is the names and types of the columns.
+    columns_with_types = next(rows)
+
+    def open_output():
+        return _Output(
+            path.format(part=len(files)) if rotate else path,
+            format_,
+            columns_with_types,
+            compression,
+            header,
+            timezone,
+        )
+
+    files, output = [], None
+    try:
+        for block in _chunks(rows, block_rows):
+            while block:
+                if output is None:
+                    output = open_output()
+                if max_file_rows:
+                    part = block[: max_file_rows - output.rows]
+                    block = block[len(part) :]
+                else:
+                    part, block = block, None
+                output.write(part)
+
+                if (max_file_rows and output.rows >= max_file_rows) or (
+                    max_file_bytes and output.bytes >= max_file_bytes
+                ):
+                    files.append(output.close())
+                    output = None
+
+        if output is None and not files:
+            # The result is empty, the file has the header or the schema.
+            output = open_output()
+        if output is not None:
+            files.append(output.close())
+            output = None
+    finally:
+        # The connection is returned to the pool, if the reading has been interrupted.
+        rows.close()
+        if output is not None:
+            output.discard()
+
+    return files
+
+
+def export_table(
+    client,
+    db,
+    table,
+    path,
+    format=None,
+    columns=None,
+    where=None,
+    order_by=None,
+    parallel=None,
+    workers=4,
+    **kwargs
+):
+    """
+    Streaming export of the table to files.
+
+    :param client: Client
+    :param db: str
+    :param table: str
+    :param path: str : with the {partition} placeholder for the parallel export,
+        if it is not there, _{partition} is added before the extension
+    :param format: str, None : csv, tsv, parquet, native, None - by the extension of path
+    :param columns: list, tuple, None
+    :param where: str
+    :param order_by: str : the order inside each file
+    :param parallel: str, None : partition - each partition into its own files
+        by a separate query, workers partitions simultaneously
+    :param workers: int
+    :param kwargs: Parameters accepted by export and the clickhouse_driver library
+    :return: list(ExportFile) : [..., (path, rows, bytes)] ordered by partition
+    """
+    if parallel is None:
+        query = client._generate_select(db, table, None, 0, columns, where, order_by)
+        return export(client, query, path, format, **kwargs)
+    elif parallel != "partition":
+        raise ValueError("Parallel can be partition, not {}".format(parallel))
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    if "{partition}" not in path:
+        path = _with_placeholder(path, "_{partition}")
+
+    def run(partition_id):
+        condition = "_partition_id = '{}'".format(partition_id)
+        where_ = "({}) AND {}".format(where, condition) if where else condition
+        query = client._generate_select(db, table, None, 0, columns, where_, order_by)
+        return export(
+            client, query, path.replace("{partition}", partition_id), format, **kwargs
+        )
+
+    query_kwargs = {k: v for k, v in kwargs.items() if k not in _EXPORT_PARAMETERS}
+    partitions = [
+        partition_id
+        for partition_id, _, _ in client.get_partitions(db, table, **query_kwargs)
+    ]
+    files, errors = [], []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(client._in_context(run), partition_id)
+            for partition_id in partitions
+        ]
+        for partition_id, future in zip(partitions, futures):
+            try:
+                files.extend(future.result())
+            except Exception as e:
+                logging.error(
+                    "Partition {} of {}.{} was not exported: {!r}".format(
+                        partition_id, db, table, e
+                    )
+                )
+                errors.append(("_partition_id = '{}'".format(partition_id), e))
+
+    if errors:
+        raise SlicesError(errors, files)
+    return files
+
+
+def _split_tsv(line):
+    fields = line.rstrip("\r\n").split("\t")
+    if "\\" in line:
+        fields = [
+            _TSV_ESCAPE_RE.sub(lambda m: _TSV_UNESCAPES.get(m.group(1), m.group(1)), i)
+            if "\\" in i and i != "\\N"
+            else i
+            for i in fields
+        ]
+    return fields
+
+
+def _text_blocks(path, format_, compression, names, types, header, block_rows):
+    """
+    :param names: list, tuple, None : column names of the file,
+        None - from the header or all inserted columns of the table
+    :param types: dict : {column name: ClickHouse type} of the table
+    :return: generator of tuple (column names, columns)
+    """
+    with open(path, "rb", buffering=2 ** 20) as f:
+        stream = _compressed(f, compression, "rb")
+        text = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+        if format_ == "csv":
+            rows = (i for i in csv.reader(text) if i)
+        else:
+            rows = (_split_tsv(line) for line in text if line.strip("\r\n"))
+
+        first = next(rows, None) if header else None
+        names = list(names or first or types)
+        # The columns that are not in the table are skipped.
+        keep = [i for i, name in enumerate(names) if name in types]
+        parsers = [_text_parser(types[names[i]]) for i in keep]
+        block_names = [names[i] for i in keep]
+
+        line = 1 if first is not None else 0
+        for chunk in _chunks(rows, block_rows):
+            for number, row in enumerate(chunk, line + 1):
+                if len(row) != len(names):
+                    raise ValueError(
+                        "Line {} of {} has {} fields instead of {}".format(
+                            number, path, len(row), len(names)
+                        )
+                    )
+            columns = list(zip(*chunk))
+            block = []
+            for i, parse in zip(keep, parsers):
+                try:
+                    block.append([parse(v) for v in columns[i]])
+                except (ValueError, TypeError) as e:
+                    raise ValueError(
+                        "Column {} of {}, lines {}-{}: {}".format(
+                            names[i], path, line + 1, line + len(chunk), e
+                        )
+                    )
+            line += len(chunk)
+            yield block_names, block
+
+
+def _parquet_blocks(path, names, types, block_rows):
+    import pyarrow as pa  # pylint: disable=import-error
+    import pyarrow.parquet as pq  # pylint: disable=import-error
+
+    with pa.memory_map(path) as source:
+        parquet = pq.ParquetFile(source)
+        schema = parquet.schema_arrow
+        names = [i for i in names or schema.names if i in types]
+        # Strings are parsed for the columns of other types, like UUID or Map.
+        parsers = [
+            _text_parser(types[name])
+            if pa.types.is_string(schema.field(name).type)
+            and not _is_string_type(types[name])
+            else None
+            for name in names
+        ]
+        for batch in parquet.iter_batches(batch_size=block_rows, columns=names):
+            columns = []
+            for values, parse in zip(batch.columns, parsers):
+                values = values.to_pylist()
+                if parse is not None:
+                    values = [None if v is None else parse(v) for v in values]
+                columns.append(values)
+            yield names, columns
+
+
+def _native_blocks(path, compression, names, types, timezone):
+    from clickhouse_driver import defines
+    from clickhouse_driver.bufferedreader import BufferedSocketReader
+    from clickhouse_driver.streams.native import BlockInputStream
+
+    if compression is None and os.path.getsize(path):
+        f, stream = _MappedFile(path), None
+    else:
+        f = open(path, "rb")
+        stream = _compressed(f, compression, "rb")
+    try:
+        reader = BufferedSocketReader(_FileSocket(stream or f), defines.BUFFER_SIZE)
+        blocks = BlockInputStream(reader, _native_context(timezone))
+        while True:
+            # The end of the file is allowed only between the blocks.
+            if reader.position == reader.current_buffer_size:
+                try:
+                    reader.read_into_buffer()
+                except EOFError:
+                    return
+            block = blocks.read()
+            if not block.num_rows:
+                continue
+            keep = [
+                i
+                for i, (name, _) in enumerate(block.columns_with_types)
+                if name in types and (not names or name in names)
+            ]
+            columns = block.get_columns()
+            yield [block.columns_with_types[i][0] for i in keep], [
+                columns[i] for i in keep
+            ]
+    finally:
+        if stream is not None and stream is not f:
+            stream.close()
+        f.close()
+
+
+def _pipeline(blocks, prefetch):
+    """
+    The blocks are read and parsed by a background thread, while the previous are being sent.
+
+    :param blocks: generator
+    :param prefetch: int : maximum number of the parsed blocks waiting for the sending
+    :return: generator
+    """
+    items = queue.Queue(maxsize=prefetch)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for block in blocks:
+                if not put(("block", block)):
+                    return
+            put(("done", None))
+        except Exception as e:
+            put(("error", e))
+        finally:
+            blocks.close()
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            kind, value = items.get()
+            if kind == "done":
+                return
+            elif kind == "error":
+                raise value
+            yield value
+    finally:
+        # Stops the reading, if the sending has failed.
+        stop.set()
+        thread.join()
+
+
+def _load(client, db, table, path, blocks, prefetch, kwargs):
+    start = time.monotonic()
+    rows, number = 0, 0
+    for number, (names, columns) in enumerate(_pipeline(blocks, prefetch), 1):
+        query = "INSERT INTO {}.{} ({}) VALUES".format(db, table, ",".join(names))
+        rows += client.execute(query, columns, columnar=True, **kwargs)
+
+    result = LoadedFile(path, rows, number, time.monotonic() - start)
+    logging.info(
+        "Loaded {} rows from {} into {}.{} in {:.1f} sec".format(
+            result.rows, path, db, table, result.seconds
+        )
+    )
+    return result
+
+
+def load_file(
+    client,
+    db,
+    table,
+    path,
+    format=None,
+    compression=None,
+    columns=None,
+    header=True,
+    block_rows=65536,
+    workers=1,
+    prefetch=2,
+    **kwargs
+):
+    """
+    Streaming insertion of CSV, TSV, Parquet or Native files.
+    The file is read in blocks of block_rows rows, the values are converted
+    to the types of the table columns and the blocks are inserted in the columnar form.
+    The next block is read and parsed by a background thread while the previous is being sent.
+
+    :param client: Client
+    :param db: str
+    :param table: str
+    :param path: str : path or glob pattern, the files are loaded in the order of the names
+    :param format: str, None : csv, tsv, parquet, native, None - by the extension of each file
+    :param compression: str, None : gzip, bz2, xz, None - by the extension of each file
+    :param columns: list, tuple, None : column names of the file, by default from the header
+        of csv and tsv or all inserted columns of the table, from the schema of parquet
+        and native, the columns that are not in the table are skipped
+    :param header: bool : the first line of csv and tsv is the column names
+    :param block_rows: int : native files are inserted by their own blocks
+    :param workers: int : number of files loaded simultaneously
+    :param prefetch: int : number of the parsed blocks waiting for the sending, limits the memory
+    :param kwargs: Parameters accepted by the clickhouse_driver library
+    :return: list(LoadedFile) : [..., (path, rows, blocks, seconds)] in the order of the files
+    """
+    paths = sorted(glob.glob(path))
+    if not paths:
+        raise FileNotFoundError("No files match {}".format(path))
+    _check_compression(compression)
+
+    types = {
+        i[0]: i[1]
+        for i in client.describe(db, table, **kwargs)
+        if i[2] not in ("ALIAS", "MATERIALIZED")
+    }
+    formats = [_file_format(i, format) for i in paths]
+    timezone = _server_timezone(client) if "native" in formats else None
+
+    def run(path_, format_):
+        compression_ = compression or _file_compression(path_)
+        if format_ == "parquet":
+            blocks = _parquet_blocks(path_, columns, types, block_rows)
+        elif format_ == "native":
+            blocks = _native_blocks(path_, compression_, columns, types, timezone)
+        else:
+            blocks = _text_blocks(
+                path_, format_, compression_, columns, types, header, block_rows
+            )
+        return _load(client, db, table, path_, blocks, prefetch, kwargs)
+
+    if workers <= 1 or len(paths) == 1:
+        return [run(path_, format_) for path_, format_ in zip(paths, formats)]
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    results, errors = [], []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(client._in_context(run), path_, format_)
+            for path_, format_ in zip(paths, formats)
+        ]
+        for path_, future in zip(paths, futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                logging.error(
+                    "File {} was not loaded into {}.{}: {!r}".format(path_, db, table, e)
+                )
+                errors.append((path_, e))
+
+    if errors:
+        raise SlicesError(errors, results)
+    return results
@@ -0,0 +1,330 @@
+# -*- coding: utf-8 -*-
+import bisect
+import functools
+import inspect
+import logging
+import threading
+import time
+import types
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class QueryEvent(object):
+    """
+    Query executed by the client. Hooks receive it before the query
+    and after it, when seconds, rows, bytes and error are filled.
+    """
+
+    def __init__(self, method, db, table, query, query_id):
+        """
+
+        :param method: str : the client method that executed the query,
+            the outer one when methods call each other, execute for direct queries
+        :param db: str, None
+        :param table: str, None
+        :param query: str
+        :param query_id: str
+        """
+        self.method = method
+        self.db = db
+        self.table = table
+        self.query = query
+        self.query_id = query_id
+        self.start = time.time()
+        self.seconds = None
+        self.read_rows = 0
+        self.read_bytes = 0
+        self.written_rows = 0
+        self.written_bytes = 0
+        self.error = None
+
+    def finish(self, last_query, error=None, seconds=None):
+        """
+        :param last_query: clickhouse_driver QueryInfo, None
+        :param error: Exception, None
+        :param seconds: float
+        """
+        self.seconds = seconds
+        self.error = error
+        progress = getattr(last_query, "progress", None)
+        if progress is not None:
+            self.read_rows = progress.rows
+            self.read_bytes = progress.bytes
+            self.written_rows = progress.written_rows
+            self.written_bytes = progress.written_bytes
+
+    def __repr__(self):
+        return (
+            "QueryEvent(method={}, db={}, table={}, query_id={}, seconds={}, "
+            "read_rows={}, written_rows={}, error={!r})"
+        ).format(
+            self.method,
+            self.db,
+            self.table,
+            self.query_id,
+            self.seconds,
+            self.read_rows,
+            self.written_rows,
+            self.error,
+        )
+
+
+class Histogram(object):
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """
+
+        :param buckets: list, tuple : upper limits of the buckets in ascending order
+        """
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """
+        :return: list(tuple) : [..., (upper limit, number of values <= limit)], the last limit is +Inf
+        """
+        result, total = [], 0
+        for limit, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            result.append((limit, total))
+        return result
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=()):
+    labels = [
+        '{}="{}"'.format(name, _escape_label(value))
+        for name, value in list(zip(names, values)) + list(extra)
+    ]
+    return "{{{}}}".format(",".join(labels)) if labels else ""
+
+
+def _format_number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry(object):
+    """
+    In-process metrics of the queries by method, db and table:
+    a histogram of the duration, counters of the queries, errors, rows and bytes.
+
+        registry = MetricsRegistry()
+        client.add_hook(after=registry.observe)
+        print(registry.to_prometheus())
+    """
+
+    LABELS = ("method", "db", "table")
+    COUNTERS = (
+        ("queries_total", "Number of queries."),
+        ("errors_total", "Number of failed queries."),
+        ("read_rows_total", "Rows read by the queries."),
+        ("read_bytes_total", "Bytes read by the queries."),
+        ("written_rows_total", "Rows written by the queries."),
+        ("written_bytes_total", "Bytes written by the queries."),
+    )
+
+    def __init__(self, prefix="clickhousepy", buckets=DEFAULT_BUCKETS):
+        """
+
+        :param prefix: str : prefix of the metric names
+        :param buckets: list, tuple : buckets of the duration histogram in seconds
+        """
+        self.prefix = prefix
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {name: {} for name, _ in self.COUNTERS}
+
+    def observe(self, event):
+        """
+        After hook for Client.add_hook.
+
+        :param event: QueryEvent
+        """
+        labels = (event.method, event.db or "", event.table or "")
+        values = {
+            "queries_total": 1,
+            "errors_total": 1 if event.error is not None else 0,
+            "read_rows_total": event.read_rows,
+            "read_bytes_total": event.read_bytes,
+            "written_rows_total": event.written_rows,
+            "written_bytes_total": event.written_bytes,
+        }
+        with self._lock:
+            histogram = self._histograms.get(labels)
+            if histogram is None:
+                histogram = self._histograms[labels] = Histogram(self.buckets)
+            histogram.observe(event.seconds or 0.0)
+            for name, value in values.items():
+                counter = self._counters[name]
+                counter[labels] = counter.get(labels, 0) + value
+
+    def histogram(self, method, db=None, table=None):
+        """
+        :return: Histogram, None
+        """
+        with self._lock:
+            return self._histograms.get((method, db or "", table or ""))
+
+    def snapshot(self):
+        """
+        :return: dict : {(method, db, table): {"count", "sum", and counters}}
+        """
+        with self._lock:
+            result = {}
+            for labels, histogram in self._histograms.items():
+                item = {"count": histogram.count, "sum": histogram.sum}
+                for name, _ in self.COUNTERS:
+                    item[name] = self._counters[name].get(labels, 0)
+                result[labels] = item
+            return result
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            for counter in self._counters.values():
+                counter.clear()
+
+    def to_prometheus(self):
+        """
+        :return: str : metrics in the Prometheus text format
+        """
+        lines = []
+        with self._lock:
+            name = "{}_query_duration_seconds".format(self.prefix)
+            lines.append("# HELP {} Duration of the queries.".format(name))
+            lines.append("# TYPE {} histogram".format(name))
+            for labels, histogram in sorted(self._histograms.items()):
+                for limit, count in histogram.cumulative():
+                    lines.append(
+                        "{}_bucket{} {}".format(
+                            name,
+                            _format_labels(
+                                self.LABELS, labels, [("le", _format_number(limit))]
+                            ),
+                            count,
+                        )
+                    )
+                label_str = _format_labels(self.LABELS, labels)
+                lines.append("{}_sum{} {}".format(name, label_str, repr(histogram.sum)))
+                lines.append("{}_count{} {}".format(name, label_str, histogram.count))
+
+            for counter_name, help_ in self.COUNTERS:
+                name = "{}_{}".format(self.prefix, counter_name)
+                lines.append("# HELP {} {}".format(name, help_))
+                lines.append("# TYPE {} counter".format(name))
+                for labels, value in sorted(self._counters[counter_name].items()):
+                    lines.append(
+                        "{}{} {}".format(name, _format_labels(self.LABELS, labels), value)
+                    )
+        return "\n".join(lines) + "\n"
+
+
+def _run_hooks(hooks, event):
+    for hook in hooks:
+        if hook is None:
+            continue
+        try:
+            hook(event)
+        except Exception as e:
+            logging.error("Hook {!r} failed: {!r}".format(hook, e))
+
+
+@contextmanager
+def _method_context(local, name, db, table):
+    stack = getattr(local, "methods", None)
+    if stack is None:
+        stack = local.methods = []
+    stack.append((name, db, table))
+    try:
+        yield
+    finally:
+        stack.pop()
+
+
+def _in_context(local, func):
+    """
+    Returns func, which runs in another thread with the method context of the current thread,
+    so that the queries of the worker threads are tagged with the outer method.
+    """
+    stack = list(getattr(local, "methods", None) or [])
+    if not stack:
+        return func
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        previous = getattr(local, "methods", None)
+        local.methods = list(stack)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            local.methods = previous
+
+    return wrapper
+
+
+def _argument_getter(params, names):
+    """
+    Returns a function that takes the first found argument from names from args and kwargs of the call.
+
+    :param params: list : names of the parameters of the method without self
+    """
+    for name in names:
+        if name in params:
+            position = params.index(name)
+
+            def get(args, kwargs, name=name, position=position):
+                if position < len(args):
+                    return args[position]
+                return kwargs.get(name)
+
+            return get
+    return lambda args, kwargs: None
+
+
+def instrument_method(name, func):
+    """
+    Wraps the client method, so that its queries are tagged with its name, db and table.
+    """
+    # The signature is read once for both getters, the methods are wrapped at import.
+    params = list(inspect.signature(func).parameters)[1:]
+    get_db = _argument_getter(params, ("db", "to_db"))
+    get_table = _argument_getter(params, ("table", "to_table"))
+
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        if not self._hooks:
+            return func(self, *args, **kwargs)
+        db, table = get_db(args, kwargs), get_table(args, kwargs)
+        with _method_context(self._local, name, db, table):
+            result = func(self, *args, **kwargs)
+        if isinstance(result, types.GeneratorType):
+            return _iterate_in_context(self._local, name, db, table, result)
+        return result
+
+    return wrapper
+
+
+def _iterate_in_context(local, name, db, table, iterator):
+    # The context is set only while the generator is running,
+    # so queries of the caller between the elements are not tagged.
+    while True:
+        with _method_context(local, name, db, table):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
@@ -0,0 +1,437 @@
+# -*- coding: utf-8 -*-
+import logging
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import Future
+
+MutationStatus = namedtuple(
+    "MutationStatus",
+    [
+        "database",
+        "table",
+        "mutation_id",
+        "command",
+        "create_time",
+        "is_done",
+        "parts_to_do",
+        "latest_fail_reason",
+    ],
+)
+
+
+class MutationTimeoutError(Exception):
+    def __init__(self, message, statuses):
+        super().__init__(message)
+        self.statuses = statuses
+
+
+class MutationFailedError(Exception):
+    def __init__(self, message, statuses):
+        super().__init__(message)
+        self.statuses = statuses
+
+
+class MutationTracker(object):
+    """
+    Tracks mutations: the status of many mutations is requested with one query
+    to system.mutations, the interval between requests grows exponentially.
+
+    Mutations are identified by (db, table, mutation_id) or by mutation_id.
+    The same mutation_id can be in different tables, so the table of a mutation_id
+    submitted through the tracker is remembered.
+    """
+
+    # The number of remembered submitted mutations.
+    max_submitted = 10000
+
+    def __init__(self, client, initial_interval=0.1, max_interval=5, factor=2):
+        """
+
+        :param client: Client
+        :param initial_interval: int, float : seconds before the first repeated check
+        :param max_interval: int, float : maximum seconds between checks
+        :param factor: int, float : the interval is multiplied by it after each check
+        """
+        self._client = client
+        self.initial_interval = initial_interval
+        self.max_interval = max_interval
+        self.factor = factor
+
+        self._lock = threading.Lock()
+        self._table_locks = {}
+        self._submitted = OrderedDict()
+        self._futures = {}
+        self._new_futures = threading.Event()
+        self._thread = None
+
+    def _intervals(self, initial=None):
+        interval = self.initial_interval if initial is None else initial
+        while True:
+            yield interval
+            interval = min(interval * self.factor, self.max_interval)
+
+    def _key(self, mutation):
+        """
+        :param mutation: str, tuple : mutation_id or (db, table, mutation_id)
+        :return: str, tuple
+        """
+        if isinstance(mutation, (list, tuple)):
+            return tuple(mutation)
+        with self._lock:
+            return self._submitted.get(mutation, mutation)
+
+    def _remember(self, db, table, mutation_id):
+        with self._lock:
+            self._submitted[mutation_id] = (db, table, mutation_id)
+            self._submitted.move_to_end(mutation_id)
+            while len(self._submitted) > self.max_submitted:
+                self._submitted.popitem(last=False)
+
+    def _find_mutation(self, db, table, command, type_mutation, seconds, **kwargs):
+        """
+        The latest mutation of the table created in the last seconds,
+        the one with the same command is preferred.
+
+        :return: str, None : mutation_id
+        """
+        command = command[command.upper().find(type_mutation) :].replace("'", "\\'")
+        query = (
+            "SELECT mutation_id "
+            "FROM system.mutations "
+            "WHERE database='{}' AND table='{}' AND command LIKE '{}%' "
+            "AND create_time >= subtractSeconds(now(), {}) "
+            "ORDER BY command = '{}' DESC, create_time DESC, mutation_id DESC "
+            "LIMIT 1"
+        ).format(db, table, type_mutation, seconds, command)
+        r = self._client.execute(query, **kwargs)
+        return r[0][0] if r else None
+
+    def submit(self, db, table, query, type_mutation, **kwargs):
+        """
+        Executes the ALTER query and returns the id of the created mutation.
+        The mutation is found with one query among the mutations of the table
+        created since the query was sent. The server stores the command in its own
+        formatting, so if no command is equal to the query, the latest mutation
+        of the type is taken. Submissions to one table through the tracker
+        are executed one at a time.
+
+        :param db: str
+        :param table: str
+        :param query: str : ALTER TABLE ... UPDATE|DELETE ...
+        :param type_mutation: str : UPDATE, DELETE : the beginning of the command in system.mutations
+        :param kwargs: Parameters accepted by the clickhouse_driver library
+        :return: str, None : mutation_id
+        """
+        with self._lock:
+            table_lock = self._table_locks.setdefault((db, table), threading.Lock())
+
+        with table_lock:
+            start = time.monotonic()
+            self._client.execute(query, **kwargs)
+            # The time is measured on the client, so that the clocks do not have to match,
+            # create_time is rounded down to seconds.
+            seconds = int(time.monotonic() - start) + 2
+            mutation_id = self._find_mutation(
+                db, table, query, type_mutation, seconds, **kwargs
+            )
+
+        if mutation_id is not None:
+            self._remember(db, table, mutation_id)
+        return mutation_id
+
+    def statuses(self, mutations, **kwargs):
+        """
+        The status of the mutations with one query.
+
+        :param mutations: list : [..., mutation_id or (db, table, mutation_id)]
+        :param kwargs: Parameters accepted by the clickhouse_driver library
+        :return: dict : {mutation: MutationStatus}, missing mutations are not included
+        """
+        mutations = [tuple(i) if isinstance(i, list) else i for i in mutations]
+        keys = {self._key(i): i for i in mutations}
+        full = [i for i in keys if isinstance(i, tuple)]
+        short = [i for i in keys if not isinstance(i, tuple)]
+        if not keys:
+            return {}
+
+        conditions = []
+        if full:
+            conditions.append(
+                "(database, table, mutation_id) IN ({})".format(
+                    ", ".join("('{}', '{}', '{}')".format(*i) for i in full)
+                )
+            )
+        if short:
+            conditions.append(
+                "mutation_id IN ({})".format(", ".join("'{}'".format(i) for i in short))
+            )
+        query = (
+            "SELECT database, table, mutation_id, command, create_time, "
+            "is_done, parts_to_do, latest_fail_reason "
+            "FROM system.mutations "
+            "WHERE {}"
+        ).format(" OR ".join(conditions))
+
+        result = {}
+        for row in self._client.execute(query, **kwargs):
+            status = MutationStatus(*row)
+            full_key = (status.database, status.table, status.mutation_id)
+            if full_key in keys:
+                result[keys[full_key]] = status
+            if status.mutation_id in keys:
+                # The mutation is done when it is done in all tables.
+                previous = result.get(status.mutation_id)
+                if previous is None or previous.is_done:
+                    result[status.mutation_id] = status
+        return result
+
+    def wait(self, mutations, timeout=None, raise_on_fail=False, **kwargs):
+        """
+        Waits for the completion of mutations.
+
+        :param mutations: list, str, tuple : mutation_id, (db, table, mutation_id) or a list of them
+        :param timeout: int, float, None : raise MutationTimeoutError after this number of seconds
+        :param raise_on_fail: bool : raise MutationFailedError if a mutation has latest_fail_reason
+        :param kwargs: Parameters accepted by the clickhouse_driver library
+        :return: dict : {mutation: MutationStatus}
+        """
+        if isinstance(mutations, str) or (
+            isinstance(mutations, tuple) and len(mutations) == 3 and isinstance(mutations[0], str)
+        ):
+            mutations = [mutations]
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        for interval in self._intervals():
+            statuses = self.statuses(mutations, **kwargs)
+            failed = [i for i in statuses.values() if i.latest_fail_reason and not i.is_done]
+            if failed and raise_on_fail:
+                raise MutationFailedError(
+                    "Mutation {} failed: {}".format(
+                        failed[0].mutation_id, failed[0].latest_fail_reason
+                    ),
+                    statuses,
+                )
+            # Missing mutations are considered done, for example, deleted by KILL MUTATION.
+            if all(i.is_done for i in statuses.values()):
+                return statuses
+
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    not_done = [k for k, v in statuses.items() if not v.is_done]
+                    raise MutationTimeoutError(
+                        "Mutations {} are not done after {} sec".format(not_done, timeout),
+                        statuses,
+                    )
+                interval = min(interval, remaining)
+            time.sleep(interval)
+
+    def wait_idle(self, db, table, initial_interval=None, timeout=None, **kwargs):
+        """
+        Waits until the table has no running mutations.
+
+        :param db: str
+        :param table: str
+        :param initial_interval: int, float, None : by default the interval of the tracker
+        :param timeout: int, float, None
+        :param kwargs: Parameters accepted by the clickhouse_driver library
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for interval in self._intervals(initial_interval):
+            count = self._client.get_count_run_mutations(db, table, **kwargs)
+            if count == 0:
+                return
+            if deadline is not None and time.monotonic() + interval > deadline:
+                raise MutationTimeoutError(
+                    "Table {}.{} has {} running mutations after {} sec".format(
+                        db, table, count, timeout
+                    ),
+                    {},
+                )
+            time.sleep(interval)
+
+    def future(self, mutation):
+        """
+        Future, that is resolved with MutationStatus when the mutation is done.
+        As in wait, a mutation missing in system.mutations is considered done,
+        then the future is resolved with None.
+        If the mutation has latest_fail_reason, the future fails with MutationFailedError.
+        All futures are checked by one background thread with one query,
+        the thread stops when there are no pending futures.
+
+        :param mutation: str, tuple : mutation_id or (db, table, mutation_id)
+        :return: concurrent.futures.Future
+        """
+        if isinstance(mutation, list):
+            mutation = tuple(mutation)
+        future = Future()
+        with self._lock:
+            self._futures.setdefault(mutation, []).append(future)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._poll, name="MutationTracker", daemon=True
+                )
+                self._thread.start()
+        self._new_futures.set()
+        return future
+
+    def _resolve(self, key, status):
+        for future in self._futures.pop(key, []):
+            if future.cancelled():
+                continue
+            if status is not None and status.latest_fail_reason and not status.is_done:
+                future.set_exception(
+                    MutationFailedError(
+                        "Mutation {} failed: {}".format(
+                            status.mutation_id, status.latest_fail_reason
+                        ),
+                        {key: status},
+                    )
+                )
+            else:
+                future.set_result(status)
+
+    def _poll(self):
+        intervals = self._intervals()
+        while True:
+            with self._lock:
+                keys = list(self._futures)
+            try:
+                statuses = self.statuses(keys)
+            except Exception as e:
+                logging.warning("Failed to check the status of mutations: {}".format(e))
+                statuses = None
+
+            with self._lock:
+                if statuses is not None:
+                    for key in keys:
+                        status = statuses.get(key)
+                        # Missing mutations are considered done, as in wait.
+                        if (
+                            status is None
+                            or status.is_done
+                            or status.latest_fail_reason
+                        ):
+                            self._resolve(key, status)
+                if not self._futures:
+                    self._thread = None
+                    return
+
+            # New futures reset the interval.
+            if self._new_futures.wait(next(intervals)):
+                self._new_futures.clear()
+                intervals = self._intervals()
+
+
+class MutationBatch(object):
+    """
+    Collects UPDATE and DELETE commands and executes them with one ALTER query,
+    so the parts of the table are rewritten by one mutation.
+    The commands are applied in the order they were added.
+
+        with table.mutation_batch() as batch:
+            batch.update("value = 0", "value < 0")
+            batch.delete("value = 0")
+        batch.wait()
+    """
+
+    def __init__(
+        self, client, db, table, prevent_parallel_processes=False, sleep=1, **kwargs
+    ):
+        """
+
+        :param client: Client
+        :param db: str
+        :param table: str
+        :param prevent_parallel_processes: bool : The request will be made when all mutations on the table are complete.
+        :param sleep: int, float : The initial interval to check the completion of all mutations in the table.
+        :param kwargs: Parameters accepted by the clickhouse_driver library
+        """
+        self._client = client
+        self.db = db
+        self.table = table
+        self.prevent_parallel_processes = prevent_parallel_processes
+        self.sleep = sleep
+        self._kwargs = kwargs
+        self.commands = []
+        self.mutation_id = None
+
+    def update(self, update, where):
+        """
+
+        :param update: str
+        :param where: str
+        """
+        self._check_not_submitted()
+        self.commands.append(("UPDATE", "UPDATE {} WHERE {}".format(update, where)))
+        return self
+
+    def delete(self, where):
+        """
+
+        :param where: str
+        """
+        self._check_not_submitted()
+        self.commands.append(("DELETE", "DELETE WHERE {}".format(where)))
+        return self
+
+    def _check_not_submitted(self):
+        if self.mutation_id is not None:
+            raise RuntimeError("Batch of mutations is already submitted")
+
+    def submit(self):
+        """
+        Executes all commands with one ALTER query.
+
+        :return: str, None : mutation_id, None if there are no commands
+        """
+        self._check_not_submitted()
+        if not self.commands:
+            return None
+
+        query = "ALTER TABLE {}.{} {}".format(
+            self.db, self.table, ", ".join(command for _, command in self.commands)
+        )
+        tracker = self._client.mutation_tracker
+        if self.prevent_parallel_processes:
+            tracker.wait_idle(
+                self.db, self.table, initial_interval=self.sleep, **self._kwargs
+            )
+        self.mutation_id = tracker.submit(
+            self.db, self.table, query, self.commands[0][0], **self._kwargs
+        )
+        return self.mutation_id
+
+    def wait(self, timeout=None, raise_on_fail=False, **kwargs):
+        """
+        Waits for the completion of the submitted mutation.
+
+        :param timeout: int, float, None
+        :param raise_on_fail: bool
+        :param kwargs: Parameters accepted by the clickhouse_driver library,
+            by default the parameters of the batch
+        :return: MutationStatus, None
+        """
+        if self.mutation_id is None:
+            return None
+        statuses = self._client.mutation_tracker.wait(
+            [(self.db, self.table, self.mutation_id)],
+            timeout,
+            raise_on_fail,
+            **dict(self._kwargs, **kwargs)
+        )
+        return statuses.get((self.db, self.table, self.mutation_id))
+
+    def __len__(self):
+        return len(self.commands)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.submit()
+
+    def __repr__(self):
+        return "MutationBatch({}.{}, commands={})".format(self.db, self.table, len(self))
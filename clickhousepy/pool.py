@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class PoolTimeoutError(Exception):
+    pass
+
+
+class ConnectionPool(object):
+    """
+    Thread-safe pool of clickhouse_driver clients.
+
+    The driver opens the socket on the first query, so creating clients is cheap,
+    the pool only limits how many of them are used at the same time.
+    The clients are created on the first acquire, so the driver
+    is not imported until the first query.
+    """
+
+    def __init__(
+        self,
+        *args,
+        min_size=1,
+        max_size=10,
+        timeout=None,
+        health_check_interval=60,
+        **kwargs
+    ):
+        """
+
+        :param args: Parameters accepted by the clickhouse_driver library
+        :param min_size: int : the number of clients that are kept in the pool
+        :param max_size: int : maximum number of clients used simultaneously
+        :param timeout: int, float, None : how many seconds to wait for a free client, None - forever
+        :param health_check_interval: int, float, None : a client that has been idle longer
+            than this number of seconds is checked with "SELECT 1" before being returned,
+            None - disables the check
+        :param kwargs: Parameters accepted by the clickhouse_driver library
+        """
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("Not valid pool size: min_size={}, max_size={}".format(
+                min_size, max_size
+            ))
+
+        self._args = args
+        self._kwargs = kwargs
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+
+        self._cond = threading.Condition()
+        self._idle = deque()
+        self._size = 0
+        self._closed = False
+        self._stats = {
+            "created": 0,
+            "acquired": 0,
+            "released": 0,
+            "discarded": 0,
+            "waits": 0,
+            "timeouts": 0,
+            "health_checks": 0,
+            "failed_health_checks": 0,
+        }
+
+        self._filled = False
+
+    def _create(self):
+        from clickhouse_driver import Client as ChClient
+
+        self._stats["created"] += 1
+        return ChClient(*self._args, **self._kwargs)
+
+    def _fill(self):
+        # Called under the lock by the first acquire.
+        self._filled = True
+        for _ in range(self.min_size - self._size):
+            self._idle.append((self._create(), time.monotonic()))
+            self._size += 1
+
+    def _is_healthy(self, conn):
+        # The query is executed outside the lock, only the statistics are updated under it.
+        try:
+            healthy = bool(conn.execute("SELECT 1")[0][0])
+        except Exception as e:
+            logging.warning("Pool connection failed health check: {}".format(e))
+            healthy = False
+        with self._cond:
+            self._stats["health_checks"] += 1
+            if not healthy:
+                self._stats["failed_health_checks"] += 1
+        return healthy
+
+    def acquire(self, timeout=None):
+        """
+        Take a client from the pool. It must be returned with the release method.
+
+        :param timeout: int, float, None : overrides the pool timeout
+        :return: clickhouse_driver.Client
+        """
+        timeout = self.timeout if timeout is None else timeout
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        with self._cond:
+            if not self._filled and not self._closed:
+                self._fill()
+            while True:
+                if self._closed:
+                    raise PoolTimeoutError("Connection pool is closed")
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    conn, last_used = None, None
+                    break
+
+                self._stats["waits"] += 1
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise PoolTimeoutError(
+                        "No free connection in the pool after {} sec".format(timeout)
+                    )
+                self._cond.wait(remaining)
+
+            self._stats["acquired"] += 1
+            if conn is None:
+                conn = self._create()
+
+        if (
+            last_used is not None
+            and self.health_check_interval is not None
+            and time.monotonic() - last_used > self.health_check_interval
+            and not self._is_healthy(conn)
+        ):
+            conn.disconnect()
+            with self._cond:
+                conn = self._create()
+
+        return conn
+
+    def release(self, conn, discard=False):
+        """
+        Return the client to the pool.
+
+        :param conn: clickhouse_driver.Client
+        :param discard: bool : close the connection instead of reusing it
+        """
+        if discard or self._closed:
+            conn.disconnect()
+
+        with self._cond:
+            self._stats["released"] += 1
+            if discard or self._closed:
+                self._stats["discarded"] += 1
+                self._size -= 1
+                if self._size < self.min_size and not self._closed:
+                    self._idle.append((self._create(), time.monotonic()))
+                    self._size += 1
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """
+        Context manager that takes a client from the pool and returns it back.
+        A client that has fallen with a network error or
+        has not read the response to the end is closed.
+
+        :param timeout: int, float, None : overrides the pool timeout
+        :return: clickhouse_driver.Client
+        """
+        from clickhouse_driver import errors
+
+        conn = self.acquire(timeout)
+        try:
+            yield conn
+        except errors.ServerException:
+            self.release(conn)
+            raise
+        except BaseException:
+            self.release(conn, discard=True)
+            raise
+        else:
+            self.release(conn)
+
+    def disconnect(self):
+        """
+        Closes the connections of the idle clients. The pool remains usable,
+        the driver connects again on the next query of a client.
+        """
+        with self._cond:
+            idle, self._idle = self._idle, deque()
+        for conn, _ in idle:
+            conn.disconnect()
+        with self._cond:
+            self._idle.extend(idle)
+            self._cond.notify_all()
+
+    def stats(self):
+        """
+        :return: dict
+        """
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update(
+                size=self._size,
+                idle=len(self._idle),
+                in_use=self._size - len(self._idle),
+                min_size=self.min_size,
+                max_size=self.max_size,
+            )
+        return stats
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, deque()
+            self._size -= len(idle)
+            self._cond.notify_all()
+
+        for conn, _ in idle:
+            conn.disconnect()
+
+    def __repr__(self):
+        return "ConnectionPool(size={}, max_size={})".format(self._size, self.max_size)
+
+
+class _PooledResult(object):
+    """
+    The result of execute_with_progress of a client taken from the pool.
+    The response is read by that client, so it is returned to the pool
+    only when the result is read to the end or the query is cancelled.
+    """
+
+    def __init__(self, pool, conn, result):
+        self._pool = pool
+        self._conn = conn
+        self._result = result
+
+    def _release(self, discard=False):
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            self._pool.release(conn, discard=discard)
+
+    def _read(self, func, *args):
+        from clickhouse_driver import errors
+
+        try:
+            return func(*args)
+        except StopIteration:
+            self._release()
+            raise
+        except errors.ServerException:
+            self._release()
+            raise
+        except BaseException:
+            self._release(discard=True)
+            raise
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self._read(next, self._result)
+
+    def get_result(self):
+        result = self._read(self._result.get_result)
+        self._release()
+        return result
+
+    def cancel(self, with_column_types=False):
+        """
+        Cancels the query, it is used instead of the cancel method of the driver client.
+        """
+        if self._conn is None:
+            return None
+        result = self._read(self._conn.cancel, with_column_types)
+        self._release()
+        return result
+
+    def __getattr__(self, name):
+        # progress_totals and other attributes of the driver result.
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self._result, name)
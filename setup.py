@@ -37,7 +37,8 @@ setup(
     url="https://github.com/pavelmaksimov/clickhousepy",
     install_requires=["clickhouse_driver"],
     extras_require={
-        "pandas": ["pandas"]
+        "pandas": ["pandas"],
+        "parquet": ["pyarrow"],
     },
     packages=[package],
     license="MIT",
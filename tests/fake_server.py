@@ -0,0 +1,1803 @@
+# -*- coding: utf-8 -*-
+import datetime as dt
+import decimal
+import hashlib
+import json
+import logging
+import re
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from collections import namedtuple
+
+from clickhouse_driver import defines
+from clickhouse_driver.block import ColumnOrientedBlock
+from clickhouse_driver.bufferedreader import BufferedSocketReader
+from clickhouse_driver.bufferedwriter import BufferedSocketWriter
+from clickhouse_driver.connection import ServerInfo
+from clickhouse_driver.context import Context
+from clickhouse_driver.protocol import ClientPacketTypes, ServerPacketTypes
+from clickhouse_driver.reader import read_binary_str, read_binary_uint8
+from clickhouse_driver.streams.native import BlockInputStream, BlockOutputStream
+from clickhouse_driver.varint import read_varint, write_varint
+from clickhouse_driver.writer import write_binary_int32, write_binary_str, write_binary_uint8
+
+from clickhousepy.cache import _QUOTED
+from clickhousepy.clickhouse import Client, _split_expressions, _unwrap_type
+
+# Settings as strings, without the features of newer servers (parameters, profile events).
+REVISION = defines.DBMS_MIN_REVISION_WITH_SETTINGS_SERIALIZED_AS_STRINGS
+VERSION = (21, 1, 0)
+
+# Codes of ClickHouse errors.
+UNKNOWN_IDENTIFIER = 47
+NOT_IMPLEMENTED = 48
+TABLE_ALREADY_EXISTS = 57
+UNKNOWN_TABLE = 60
+SYNTAX_ERROR = 62
+UNKNOWN_DATABASE = 81
+DATABASE_ALREADY_EXISTS = 82
+STD_EXCEPTION = 1001
+
+_NAME = r"(?:`[^`]+`|\"[^\"]+\"|[\w$]+)"
+_REF = r"({0})(?:\s*\.\s*({0}))?".format(_NAME)
+_DATE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+_Column = namedtuple(
+    "_Column", ["name", "type", "default_kind", "default_expression", "comment"]
+)
+
+
+class FakeServerError(Exception):
+    """Error that is sent to the client as an exception of the server."""
+
+    def __init__(self, message, code=NOT_IMPLEMENTED):
+        super().__init__(message)
+        self.code = code
+
+
+class _Result(object):
+    def __init__(self, columns_with_types=(), columns=(), read_rows=0, written_rows=0):
+        """
+
+        :param columns_with_types: list(tuple) : [..., (name, type)]
+        :param columns: list(list) : values by columns
+        :param read_rows: int
+        :param written_rows: int
+        """
+        self.columns_with_types = list(columns_with_types)
+        self.columns = list(columns)
+        self.read_rows = read_rows
+        self.written_rows = written_rows
+        self.database = None
+
+    @property
+    def rows(self):
+        return len(self.columns[0]) if self.columns else 0
+
+
+def _unquote(name):
+    name = name.strip()
+    if len(name) > 1 and name[0] in "`\"" and name[-1] == name[0]:
+        return name[1:-1]
+    return name
+
+
+def _sqlite_name(*names):
+    return '"{}"'.format(".".join(names).replace('"', '""'))
+
+
+def _base_type(type_):
+    type_, _ = _unwrap_type(type_, "LowCardinality")
+    return _unwrap_type(type_, "Nullable")
+
+
+def _affinity(type_):
+    base, _ = _base_type(type_)
+    if base.startswith(("UInt", "Int", "Bool")):
+        return "INTEGER"
+    elif base.startswith(("Float", "Decimal")):
+        return "REAL"
+    return "TEXT"
+
+
+def _default_value(type_):
+    """The value of the type that ClickHouse uses instead of missing values."""
+    base, nullable = _base_type(type_)
+    if nullable:
+        return None
+    elif base.startswith(("UInt", "Int", "Bool")):
+        return 0
+    elif base.startswith(("Float", "Decimal")):
+        return 0.0
+    elif base.startswith("DateTime"):
+        return "1970-01-01 00:00:00"
+    elif base.startswith("Date"):
+        return "1970-01-01"
+    elif base == "UUID":
+        return "00000000-0000-0000-0000-000000000000"
+    elif base.startswith(("Array", "Map")):
+        return "[]" if base.startswith("Array") else "{}"
+    return ""
+
+
+def _sql_value(value):
+    if value is None:
+        return "NULL"
+    elif isinstance(value, str):
+        return "'{}'".format(value.replace("'", "''"))
+    return repr(value)
+
+
+def _to_sqlite(value):
+    """The value received from the client -> the value stored in SQLite."""
+    if isinstance(value, dt.datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(dt.timezone.utc).replace(tzinfo=None)
+        return value.isoformat(" ")
+    elif isinstance(value, dt.date):
+        return value.isoformat()
+    elif isinstance(value, (decimal.Decimal, uuid.UUID)):
+        return str(value)
+    elif isinstance(value, (list, tuple, dict)):
+        return json.dumps(value, default=str)
+    return value
+
+
+def _from_sqlite(type_, value):
+    """The value stored in SQLite -> the value of the ClickHouse type for the client."""
+    base, nullable = _base_type(type_)
+    if value is None:
+        if nullable:
+            return None
+        value = _default_value(base)
+
+    if base.startswith("DateTime"):
+        # Aware, so that the driver does not shift it to the time zone of the column.
+        if isinstance(value, (int, float)):
+            return dt.datetime.fromtimestamp(value, dt.timezone.utc)
+        return dt.datetime.fromisoformat(value).replace(tzinfo=dt.timezone.utc)
+    elif base.startswith("Date"):
+        return dt.date.fromisoformat(value[:10])
+    elif base.startswith(("UInt", "Int")):
+        return int(value)
+    elif base.startswith("Float"):
+        return float(value)
+    elif base.startswith("Decimal"):
+        return decimal.Decimal(str(value))
+    elif base == "Bool":
+        return bool(value)
+    elif base == "UUID":
+        return uuid.UUID(str(value))
+    elif base.startswith("Array("):
+        items = json.loads(value) if isinstance(value, str) else value
+        return [_from_sqlite(base[6:-1], i) for i in items]
+    elif base.startswith(("Tuple(", "Map(")):
+        return json.loads(value) if isinstance(value, str) else value
+    elif isinstance(value, bytes):
+        return value.decode("utf-8", "replace")
+    return value if isinstance(value, str) else str(value)
+
+
+def _integer_type(value):
+    """The smallest type of an integer literal, as ClickHouse types it."""
+    for bits in (8, 16, 32, 64):
+        if 0 <= value < 2 ** bits:
+            return "UInt{}".format(bits)
+        elif -(2 ** (bits - 1)) <= value < 0:
+            return "Int{}".format(bits)
+    return "Int128"
+
+
+def _infer_type(values):
+    """Type of the result column of an expression, which is not a column of a table."""
+    types_ = {type(i) for i in values if i is not None}
+    if not types_:
+        type_ = "String"
+    elif types_ == {int}:
+        type_ = "UInt64" if all(i >= 0 for i in values if i is not None) else "Int64"
+    elif types_ <= {int, float}:
+        type_ = "Float64"
+    else:
+        type_ = "String"
+    return "Nullable({})".format(type_) if None in values else type_
+
+
+# Types of the results of functions, that do not depend on the arguments.
+_FUNCTION_TYPES = {
+    "count": "UInt64",
+    "uniq": "UInt64",
+    "uniqExact": "UInt64",
+    "length": "UInt64",
+    "cityHash64": "UInt64",
+    "avg": "Float64",
+    "now": "DateTime",
+    "today": "Date",
+    "toStartOfMonth": "Date",
+    "toYYYYMM": "UInt32",
+    "toYYYYMMDD": "UInt32",
+    "toUnixTimestamp": "UInt32",
+    "toUUID": "UUID",
+}
+
+
+def _expression_type(expression, tables):
+    """
+    :param expression: str : ClickHouse expression
+    :param tables: list(_Table) : tables of the query
+    :return: str, None : None - unknown
+    """
+    expression = expression.strip()
+    name = _unquote(expression)
+    for table in tables:
+        column = table.column(name)
+        if column is not None:
+            return column.type
+
+    if re.match(r"^-?\d+$", expression):
+        return _integer_type(int(expression))
+    elif re.match(r"^-?\d*\.\d+(e-?\d+)?$", expression, re.I):
+        return "Float64"
+    elif re.match(r"^'.*'$", expression, re.S):
+        return "String"
+
+    match = re.match(r"^(\w+)\s*\((.*)\)$", expression, re.S)
+    if match is None:
+        return None
+    function, arguments = match.group(1), _split_expressions(match.group(2))
+
+    cast = re.match(r"^to((?:U?Int|Float)\d+|Date|DateTime|String)(OrZero|OrNull)?$", function)
+    if cast is not None:
+        if cast.group(2) == "OrNull":
+            return "Nullable({})".format(cast.group(1))
+        return cast.group(1)
+    elif function in _FUNCTION_TYPES:
+        return _FUNCTION_TYPES[function]
+
+    if function == "arrayJoin" and arguments and arguments[0].startswith("["):
+        types_ = {_expression_type(i, tables) for i in _split_expressions(arguments[0][1:-1])}
+        return types_.pop() if len(types_) == 1 else None
+
+    inner = _expression_type(arguments[0], tables) if arguments else None
+    if inner is None:
+        return None
+    elif function in ("min", "max", "any", "anyLast", "argMin", "argMax", "ifNull"):
+        return inner
+    elif function == "sum":
+        base, _ = _base_type(inner)
+        if base.startswith("Float"):
+            return "Float64"
+        return "UInt64" if base.startswith("UInt") else "Int64"
+    elif function == "toNullable":
+        return inner if _base_type(inner)[1] else "Nullable({})".format(inner)
+    elif function == "toLowCardinality":
+        return "LowCardinality({})".format(inner)
+    return None
+
+
+def _partition_value_id(value):
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    value = str(value)
+    return value.replace("-", "") if _DATE.match(value) else value
+
+
+def _partition_id(*values):
+    """Id of the partition by the values of the partition key, "all" without the key."""
+    if not values:
+        return "all"
+    return "-".join(_partition_value_id(i) for i in values)
+
+
+def _parse_literal(text):
+    text = text.strip()
+    if text[:1] == "'":
+        return re.sub(r"\\(.)", r"\1", text[1:-1]).replace("''", "'")
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+def _partition_expression_id(text):
+    """ID 'x' or the value of the partition key: 'x', ('x', 1), tuple('x') -> id"""
+    text = text.strip()
+    match = re.match(r"^ID\s+('.*')$", text, re.I | re.S)
+    if match is not None:
+        return _parse_literal(match.group(1))
+    text = re.sub(r"^tuple\s*(?=\()", "", text)
+    if text.startswith("(") and text.endswith(")"):
+        return _partition_id(*[_parse_literal(i) for i in _split_expressions(text[1:-1])])
+    return _partition_id(_parse_literal(text))
+
+
+def _closing_bracket(text, start):
+    """Position of the bracket that closes the bracket at start."""
+    depth, quote = 0, None
+    for i in range(start, len(text)):
+        char = text[i]
+        if quote:
+            if char == quote and text[i - 1] != "\\":
+                quote = None
+        elif char in "'`\"":
+            quote = char
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+            if depth == 0:
+                return i
+    raise FakeServerError("Unmatched bracket: {}".format(text[start:]), SYNTAX_ERROR)
+
+
+def _split_top_level(text, pattern):
+    """Splits text at the matches of the pattern outside of brackets and quotes."""
+    parts, depth, quote, start, i = [], 0, None, 0, 0
+    regex = re.compile(pattern, re.I)
+    while i < len(text):
+        char = text[i]
+        if quote:
+            if char == quote and text[i - 1] != "\\":
+                quote = None
+        elif char in "'`\"":
+            quote = char
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif depth == 0:
+            match = regex.match(text, i)
+            # A word is matched only from its beginning.
+            word = char.isalnum() or char == "_"
+            if match is not None and not (word and i and (text[i - 1].isalnum() or text[i - 1] == "_")):
+                parts.append(text[start:i])
+                # Zero-length matches split before the keyword.
+                start, i = match.end(), max(match.end(), i + 1)
+                continue
+        i += 1
+    parts.append(text[start:])
+    return parts
+
+
+def _parse_column(definition):
+    """name Type [DEFAULT|MATERIALIZED|ALIAS expr] [COMMENT 'x'] [CODEC(...)] [TTL expr]"""
+    definition = definition.strip()
+    match = re.match(_NAME, definition)
+    name = _unquote(match.group(0))
+    rest = _split_top_level(
+        definition[match.end() :], r"\s+(?=(DEFAULT|MATERIALIZED|ALIAS|COMMENT|CODEC|TTL)\b)"
+    )
+    type_, default_kind, default_expression, comment = rest[0].strip(), "", "", ""
+    for clause in rest[1:]:
+        keyword, _, value = clause.strip().partition(" ")
+        keyword, value = keyword.upper(), value.strip()
+        if keyword in ("DEFAULT", "MATERIALIZED", "ALIAS"):
+            default_kind, default_expression = keyword, value
+        elif keyword == "COMMENT":
+            comment = _parse_literal(value)
+    if not type_ and default_kind:
+        raise FakeServerError(
+            "Column {} without type is not supported".format(name), NOT_IMPLEMENTED
+        )
+    return _Column(name, type_, default_kind, default_expression, comment)
+
+
+def _key_expressions(text):
+    """(a, b), tuple(), a -> [a, b], [], [a]"""
+    text = (text or "").strip()
+    text = re.sub(r"^tuple\s*(?=\()", "", text)
+    if text.startswith("(") and _closing_bracket(text, 0) == len(text) - 1:
+        text = text[1:-1]
+    return _split_expressions(text)
+
+
+class _Table(object):
+    def __init__(self, db, name, columns, engine, sorting_key=(), partition_key=(), create_query=""):
+        self.db = db
+        self.name = name
+        self.columns = list(columns)
+        self.engine = engine
+        self.sorting_key = list(sorting_key)
+        self.partition_key = list(partition_key)
+        self.create_query = create_query
+
+    @property
+    def sql_name(self):
+        return _sqlite_name(self.db, self.name)
+
+    def column(self, name):
+        for column in self.columns:
+            if column.name == name:
+                return column
+        return None
+
+    def ordinary(self):
+        """Columns that are inserted and selected by *."""
+        return [i for i in self.columns if i.default_kind in ("", "DEFAULT")]
+
+    def set_column(self, column):
+        self.columns = [column if i.name == column.name else i for i in self.columns]
+
+
+# Columns of the system tables.
+_SYSTEM_TABLES = {
+    "databases": [("name", "String"), ("engine", "String")],
+    "tables": [
+        ("database", "String"),
+        ("name", "String"),
+        ("engine", "String"),
+        ("is_temporary", "UInt8"),
+        ("create_table_query", "String"),
+        ("partition_key", "String"),
+        ("sorting_key", "String"),
+        ("primary_key", "String"),
+        ("total_rows", "Nullable(UInt64)"),
+        ("total_bytes", "Nullable(UInt64)"),
+    ],
+    "columns": [
+        ("database", "String"),
+        ("table", "String"),
+        ("name", "String"),
+        ("type", "String"),
+        ("position", "UInt64"),
+        ("default_kind", "String"),
+        ("default_expression", "String"),
+        ("data_compressed_bytes", "UInt64"),
+        ("data_uncompressed_bytes", "UInt64"),
+        ("marks_bytes", "UInt64"),
+        ("comment", "String"),
+        ("is_in_partition_key", "UInt8"),
+        ("is_in_sorting_key", "UInt8"),
+        ("is_in_primary_key", "UInt8"),
+    ],
+    "parts": [
+        ("database", "String"),
+        ("table", "String"),
+        ("partition", "String"),
+        ("partition_id", "String"),
+        ("name", "String"),
+        ("active", "UInt8"),
+        ("rows", "UInt64"),
+        ("bytes_on_disk", "UInt64"),
+        ("data_compressed_bytes", "UInt64"),
+        ("data_uncompressed_bytes", "UInt64"),
+        ("min_date", "Date"),
+        ("max_date", "Date"),
+        ("min_time", "DateTime"),
+        ("max_time", "DateTime"),
+        ("level", "UInt32"),
+    ],
+    "mutations": [
+        ("database", "String"),
+        ("table", "String"),
+        ("mutation_id", "String"),
+        ("command", "String"),
+        ("create_time", "DateTime"),
+        ("parts_to_do", "Int64"),
+        ("is_done", "UInt8"),
+        ("is_killed", "UInt8"),
+        ("latest_failed_part", "String"),
+        ("latest_fail_time", "DateTime"),
+        ("latest_fail_reason", "String"),
+    ],
+    "one": [("dummy", "UInt8")],
+}
+
+# Fixed sizes of the values of the types in bytes, for the sizes of parts and columns.
+_TYPE_SIZES = {
+    "UInt8": 1, "Int8": 1, "Bool": 1, "UInt16": 2, "Int16": 2, "Date": 2,
+    "UInt32": 4, "Int32": 4, "Float32": 4, "DateTime": 4,
+    "UInt64": 8, "Int64": 8, "Float64": 8, "UUID": 16,
+}  # fmt: skip
+
+
+def _register_functions(conn):
+    def to_date(value):
+        if value is None:
+            return None
+        elif isinstance(value, (int, float)):
+            return (dt.date(1970, 1, 1) + dt.timedelta(days=int(value))).isoformat()
+        return str(value)[:10]
+
+    def to_datetime(value):
+        if value is None:
+            return None
+        elif isinstance(value, (int, float)):
+            return dt.datetime.utcfromtimestamp(value).isoformat(" ")
+        value = str(value)
+        return value + " 00:00:00" if _DATE.match(value) else value
+
+    def to_string(value):
+        if value is None:
+            return None
+        return repr(value) if isinstance(value, float) else str(value)
+
+    def to_int(value):
+        return None if value is None else int(float(value))
+
+    def to_float(value):
+        return None if value is None else float(value)
+
+    def or_zero(func):
+        def convert(value):
+            try:
+                return func(value)
+            except (TypeError, ValueError):
+                return 0
+
+        return convert
+
+    def or_null(func):
+        def convert(value):
+            try:
+                return func(value)
+            except (TypeError, ValueError):
+                return None
+
+        return convert
+
+    def city_hash(*values):
+        # Not the real cityHash64, SQLite integers are limited by 2^63.
+        digest = hashlib.blake2b(repr(values).encode(), digest_size=8).digest()
+        return int.from_bytes(digest, "big") >> 1
+
+    def yyyymm(value):
+        return None if value is None else int(str(value)[:7].replace("-", ""))
+
+    def yyyymmdd(value):
+        return None if value is None else int(str(value)[:10].replace("-", ""))
+
+    def unix_timestamp(value):
+        # Date and time are stored in UTC.
+        if value is None:
+            return None
+        value = dt.datetime.fromisoformat(str(value)).replace(tzinfo=dt.timezone.utc)
+        return int(value.timestamp())
+
+    def subtract_seconds(value, seconds):
+        if value is None:
+            return None
+        return (dt.datetime.fromisoformat(str(value)) - dt.timedelta(seconds=seconds)).isoformat(" ")
+
+    functions = {
+        "subtractSeconds": subtract_seconds,
+        "toDate": to_date,
+        "toDateTime": to_datetime,
+        "toString": to_string,
+        "toNullable": lambda value: value,
+        "toLowCardinality": lambda value: value,
+        "toYYYYMM": yyyymm,
+        "toYYYYMMDD": yyyymmdd,
+        "toUnixTimestamp": unix_timestamp,
+        "toStartOfMonth": lambda value: None if value is None else str(value)[:8] + "01",
+        "isNull": lambda value: int(value is None),
+        "isNotNull": lambda value: int(value is not None),
+        "intDiv": lambda a, b: int(a // b),
+        "_partition_id": _partition_id,
+        "cityHash64": city_hash,
+        "concat": lambda *values: "".join("" if i is None else str(i) for i in values),
+    }
+    for bits in (8, 16, 32, 64, 128, 256):
+        for prefix in ("Int", "UInt"):
+            functions["to{}{}".format(prefix, bits)] = to_int
+    functions["toFloat32"] = functions["toFloat64"] = to_float
+
+    for name, func in list(functions.items()):
+        if name.startswith(("toInt", "toUInt", "toFloat", "toDate")):
+            functions[name + "OrZero"] = or_zero(func)
+            functions[name + "OrNull"] = or_null(func)
+    for name, func in functions.items():
+        conn.create_function(name, -1, func, deterministic=True)
+    conn.create_function("now", 0, lambda: dt.datetime.utcnow().replace(microsecond=0).isoformat(" "))
+    conn.create_function("today", 0, lambda: dt.datetime.utcnow().date().isoformat())
+
+    class Any(object):
+        def __init__(self):
+            self.value = None
+
+        def step(self, value):
+            if self.value is None:
+                self.value = value
+
+        def finalize(self):
+            return self.value
+
+    class AnyLast(Any):
+        def step(self, value):
+            if value is not None:
+                self.value = value
+
+    class Uniq(object):
+        def __init__(self):
+            self.values = set()
+
+        def step(self, *values):
+            self.values.add(values)
+
+        def finalize(self):
+            return len(self.values)
+
+    conn.create_aggregate("any", 1, Any)
+    conn.create_aggregate("anyLast", 1, AnyLast)
+    conn.create_aggregate("uniq", -1, Uniq)
+    conn.create_aggregate("uniqExact", -1, Uniq)
+
+
+def _translate_literal(literal):
+    """ClickHouse string literal with backslash escapes -> SQLite literal."""
+    escapes = {"n": "\n", "t": "\t", "r": "\r", "0": "\0"}
+    value = re.sub(r"\\(.)", lambda m: escapes.get(m.group(1), m.group(1)), literal[1:-1], flags=re.S)
+    return "'{}'".format(value.replace("''", "'").replace("'", "''"))
+
+
+def _numbers(match):
+    start, count = (match.group(1), match.group(2)) if match.group(2) else ("0", match.group(1))
+    return (
+        "(WITH RECURSIVE _numbers(number) AS (SELECT {0} UNION ALL SELECT number + 1 "
+        "FROM _numbers LIMIT {1}) SELECT number FROM _numbers)"
+    ).format(start, count)
+
+
+class _Store(object):
+    """
+    Databases and tables of the server in one in-memory SQLite database,
+    the table db.t is the SQLite table "db.t", the types of the columns are kept in the catalog.
+    """
+
+    def __init__(self, mutation_delay=0):
+        self.mutation_delay = mutation_delay
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(":memory:", check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA case_sensitive_like = ON")
+        _register_functions(self.conn)
+        self.databases = {"default": {}, "system": {}}
+        self.detached = {}
+        self.mutations = []
+        self.mutation_number = 0
+
+        for name, columns in _SYSTEM_TABLES.items():
+            table = _Table(
+                "system", name, [_Column(n, t, "", "", "") for n, t in columns], "System"
+            )
+            self._create_sqlite_table(table)
+            self.databases["system"][name] = table
+
+    # Catalog.
+
+    def table(self, db, name):
+        if db not in self.databases:
+            raise FakeServerError("Database {} doesn't exist".format(db), UNKNOWN_DATABASE)
+        table = self.databases[db].get(name)
+        if table is None:
+            raise FakeServerError("Table {}.{} doesn't exist".format(db, name), UNKNOWN_TABLE)
+        return table
+
+    def _ref(self, match, database, group=1):
+        """(db, table) of the regex match of _REF."""
+        first, second = match.group(group), match.group(group + 1)
+        if second is None:
+            return database, _unquote(first)
+        return _unquote(first), _unquote(second)
+
+    def _column_sql(self, table, column):
+        name = _sqlite_name(column.name)
+        if column.default_kind in ("MATERIALIZED", "ALIAS"):
+            expression, _ = self.translate(column.default_expression, table.db)
+            return "{} GENERATED ALWAYS AS ({}) VIRTUAL".format(name, expression)
+
+        default = _default_value(column.type)
+        if column.default_kind == "DEFAULT" and re.match(
+            r"^(-?\d+(\.\d+)?|'.*')$", column.default_expression, re.S
+        ):
+            default = _parse_literal(column.default_expression)
+        return "{} {} DEFAULT {}".format(name, _affinity(column.type), _sql_value(default))
+
+    def _create_sqlite_table(self, table):
+        columns = [self._column_sql(table, i) for i in table.columns]
+        if table.db != "system":
+            keys = [self.translate(i, table.db)[0] for i in table.partition_key]
+            columns.append(
+                '"_partition_id" TEXT GENERATED ALWAYS AS (_partition_id({})) VIRTUAL'.format(
+                    ", ".join(keys)
+                )
+            )
+        self.conn.execute("CREATE TABLE {} ({})".format(table.sql_name, ", ".join(columns)))
+
+    # Translation of the queries.
+
+    def translate(self, query, database):
+        """
+        ClickHouse query -> SQLite query.
+
+        :return: tuple : (query, list of the tables of the query)
+        """
+        parts = _QUOTED.split(query)
+        tables = []
+
+        def table_ref(match):
+            db, name = match.group(1), match.group(2)
+            if db not in self.databases:
+                return match.group(0)
+            table = self.table(db, name)
+            tables.append(table)
+            return table.sql_name
+
+        def unqualified_ref(match):
+            table = self.databases.get(database, {}).get(match.group(2))
+            if table is None:
+                return match.group(0)
+            tables.append(table)
+            return "{} {}".format(match.group(1), table.sql_name)
+
+        result = []
+        for i, part in enumerate(parts):
+            if i % 2:
+                if part[0] == "'":
+                    result.append(_translate_literal(part))
+                elif part[0] == "`":
+                    result.append('"{}"'.format(part[1:-1].replace('"', '""')))
+                else:
+                    result.append(part)
+                continue
+
+            end = re.search(r"\b(SETTINGS|FORMAT)\b", part, re.I)
+            if end is not None:
+                part = part[: end.start()]
+            part = re.sub(r"\bFINAL\b|\bWITH\s+TIES\b", "", part, flags=re.I)
+            part = re.sub(r"\bnumbers\s*\(\s*(\d+)\s*(?:,\s*(\d+)\s*)?\)", _numbers, part)
+            part = re.sub(r"\bif\s*\(", "iif(", part, flags=re.I)
+            part = re.sub(r"\btuple\s*\(", "(", part)
+            # Arrays are kept as JSON.
+            part = part.replace("[", "json_array(").replace("]", ")")
+            # Division of integers in ClickHouse returns Float64.
+            part = re.sub(r"(?<![/*])/(?![/*])", "* 1.0 /", part)
+            part = re.sub(
+                r"(?<![\w.\"])([A-Za-z_][\w$]*)\.([A-Za-z_][\w$]*)\b(?!\s*\()", table_ref, part
+            )
+            part = re.sub(r"\b(FROM|JOIN)\s+([A-Za-z_][\w$]*)\b(?!\s*[.(])", unqualified_ref, part, flags=re.I)
+            part = re.sub(r"(?<![\w.\"])table\b", '"table"', part)
+            result.append(part)
+            if end is not None:
+                break
+
+        return self._expand_asterisk("".join(result), tables), tables
+
+    def _expand_asterisk(self, query, tables):
+        """SELECT * -> SELECT of the ordinary columns, without the virtual column _partition_id."""
+        by_name = {i.sql_name: i for i in tables}
+
+        def expand(match):
+            source = re.compile(r"\bFROM\s+(\"(?:[^\"]|\"\")+\")", re.I).search(query, match.end())
+            table = by_name.get(source.group(1)) if source is not None else None
+            if table is None:
+                return match.group(0)
+            return "{} {}".format(
+                match.group(1), ", ".join(_sqlite_name(i.name) for i in table.ordinary())
+            )
+
+        return re.sub(r"\b(SELECT(?:\s+DISTINCT)?)\s+\*(?=\s*(?:,|\bFROM\b))", expand, query, flags=re.I)
+
+    def _select_expressions(self, query, tables):
+        """Expressions of the outer SELECT with the asterisk expanded."""
+        match = re.match(r"^\s*SELECT\s+(?:DISTINCT\s+)?", query, re.I)
+        if match is None:
+            return []
+        text = _split_top_level(query[match.end() :], r"\s+FROM\b")[0]
+        expressions = []
+        for item in _split_expressions(text):
+            alias = re.match(r"^(.*\S)\s+AS\s+(%s)$" % _NAME, item, re.I | re.S)
+            if alias is not None:
+                item = alias.group(1)
+            if item == "*" and tables:
+                expressions += [i.name for i in tables[0].ordinary()]
+            else:
+                expressions.append(item)
+        return expressions
+
+    # Queries.
+
+    def execute(self, query, database):
+        """
+        :param query: str
+        :param database: str : database of the connection
+        :return: _Result
+        """
+        query = query.strip().rstrip(";").strip()
+        words = query.split(None, 2)
+        head = " ".join(words[:2]).upper()
+        with self.lock:
+            try:
+                if head.startswith(("SELECT", "WITH")):
+                    return self._select(query, database)
+                elif head.startswith("INSERT"):
+                    return self._insert_query(query, database)
+                elif head.startswith("CREATE"):
+                    return self._create(query, database)
+                elif head.startswith("DROP"):
+                    return self._drop(query, database)
+                elif head.startswith("ALTER"):
+                    return self._alter(query, database)
+                elif head.startswith("RENAME"):
+                    return self._rename(query, database)
+                elif head.startswith("TRUNCATE"):
+                    return self._truncate(query, database)
+                elif head.startswith("OPTIMIZE"):
+                    return self._optimize(query, database)
+                elif head.startswith(("EXISTS", "CHECK")):
+                    return self._exists(query, database)
+                elif head.startswith("DESC"):
+                    return self._describe(query, database)
+                elif head.startswith("SHOW"):
+                    return self._show(query, database)
+                elif head.startswith(("ATTACH", "DETACH")):
+                    return self._attach(query, database)
+                elif head.startswith("USE"):
+                    result = _Result()
+                    result.database = _unquote(words[1])
+                    self.table_names(result.database)
+                    return result
+                elif head.startswith("SET "):
+                    return _Result()
+            except sqlite3.Error as e:
+                message = str(e)
+                if "no such table" in message:
+                    code = UNKNOWN_TABLE
+                elif "no such column" in message:
+                    code = UNKNOWN_IDENTIFIER
+                elif "syntax error" in message:
+                    code = SYNTAX_ERROR
+                else:
+                    code = STD_EXCEPTION
+                raise FakeServerError("{} in query: {}".format(message, query), code)
+        raise FakeServerError("Query is not supported: {}".format(query), NOT_IMPLEMENTED)
+
+    def table_names(self, db):
+        if db not in self.databases:
+            raise FakeServerError("Database {} doesn't exist".format(db), UNKNOWN_DATABASE)
+        return sorted(self.databases[db])
+
+    def _select(self, query, database):
+        if re.search(r"\bsystem\s*\.", query):
+            self._refresh_system()
+        sql, tables = self.translate(query, database)
+        sql = self._array_join(sql)
+        ties = re.search(r"\bLIMIT\s+(\d+)\s+WITH\s+TIES\b", query, re.I)
+        if ties is not None:
+            names, rows = self._select_with_ties(sql, int(ties.group(1)))
+        else:
+            cursor = self.conn.execute(sql)
+            names = [i[0] for i in cursor.description]
+            rows = cursor.fetchall()
+        columns = [list(i) for i in zip(*rows)] if rows else [[] for _ in names]
+
+        expressions = self._select_expressions(query, tables)
+        if len(expressions) != len(names):
+            expressions = names
+        columns_with_types = []
+        for i, (name, expression) in enumerate(zip(names, expressions)):
+            type_ = _expression_type(expression, tables) or _infer_type(columns[i])
+            columns[i] = [_from_sqlite(type_, v) for v in columns[i]]
+            columns_with_types.append((name, type_))
+        return _Result(columns_with_types, columns, read_rows=len(rows))
+
+    def _array_join(self, sql):
+        """arrayJoin(array) -> the value of json_each(array) joined to the table of the query."""
+        joins = []
+        while True:
+            match = re.search(r"\barrayJoin\s*\(", sql)
+            if match is None:
+                break
+            end = _closing_bracket(sql, match.end() - 1)
+            alias = "_array_join_{}".format(len(joins))
+            joins.append("json_each({}) AS {}".format(sql[match.end() : end], alias))
+            sql = "{}{}.value{}".format(sql[: match.start()], alias, sql[end + 1 :])
+        if not joins:
+            return sql
+
+        parts = _split_top_level(sql, r"\s+(?=FROM\b)")
+        if len(parts) == 1:
+            return "{} FROM {}".format(sql, ", ".join(joins))
+        source = re.match(r"^FROM\s+(\"(?:[^\"]|\"\")+\"|\w+)", parts[1], re.I)
+        if source is None:
+            raise FakeServerError("arrayJoin is supported only with FROM of a table")
+        parts[1] = "{}, {}{}".format(
+            source.group(0), ", ".join(joins), parts[1][source.end() :]
+        )
+        return " ".join(parts)
+
+    def _select_with_ties(self, sql, limit):
+        """
+        LIMIT n WITH TIES, which SQLite does not have: the rows are read
+        with the values of ORDER BY until the values differ from the values of the n-th row.
+        """
+        order = re.search(r"\bORDER\s+BY\s+(.+?)\s+LIMIT\s+\d+\s*$", sql, re.I | re.S)
+        if order is None:
+            raise FakeServerError("WITH TIES without ORDER BY is not supported")
+        keys = [
+            re.sub(r"\s+(ASC|DESC)$", "", i.strip(), flags=re.I)
+            for i in _split_expressions(order.group(1))
+        ]
+        parts = _split_top_level(sql[: order.start()], r"\s+(?=FROM\b)")
+        cursor = self.conn.execute(
+            "{}, {} {} ORDER BY {}".format(
+                parts[0], ", ".join(keys), " ".join(parts[1:]), order.group(1)
+            )
+        )
+        names = [i[0] for i in cursor.description][: -len(keys)]
+        rows = cursor.fetchmany(limit)
+        if len(rows) == limit:
+            last = rows[-1][-len(keys) :]
+            for row in cursor:
+                if row[-len(keys) :] != last:
+                    break
+                rows.append(row)
+        return names, [row[: -len(keys)] for row in rows]
+
+    def _insert_target(self, query, database):
+        match = re.match(r"^INSERT\s+INTO\s+(?:TABLE\s+)?" + _REF + r"\s*", query, re.I)
+        if match is None:
+            raise FakeServerError("Not valid INSERT query: {}".format(query), SYNTAX_ERROR)
+        table = self.table(*self._ref(match, database))
+        rest = query[match.end() :]
+        if rest.startswith("("):
+            end = _closing_bracket(rest, 0)
+            names = [_unquote(i) for i in _split_expressions(rest[1:end])]
+            for name in names:
+                if table.column(name) is None:
+                    raise FakeServerError(
+                        "No such column {} in table {}.{}".format(name, table.db, table.name),
+                        UNKNOWN_IDENTIFIER,
+                    )
+            columns = [table.column(i) for i in names]
+            rest = rest[end + 1 :].strip()
+        else:
+            columns = table.ordinary()
+        return table, columns, rest
+
+    def insert_columns(self, query, database):
+        """
+        Target of INSERT query, whose data is sent in blocks.
+
+        :return: tuple : (_Table, list(_Column)), None if the query contains the data
+        """
+        with self.lock:
+            table, columns, rest = self._insert_target(query, database)
+        if re.match(r"^(VALUES|FORMAT\s+\w+)?$", rest, re.I):
+            return table, columns
+        return None
+
+    def insert_rows(self, table, names, columns):
+        """
+        :param table: _Table
+        :param names: list : names of the columns
+        :param columns: list : values by columns
+        :return: int : number of inserted rows
+        """
+        simple = (int, float, str, type(None))
+        columns = [
+            values if all(isinstance(v, simple) for v in values) else list(map(_to_sqlite, values))
+            for values in columns
+        ]
+        query = "INSERT INTO {} ({}) VALUES ({})".format(
+            table.sql_name, ", ".join(_sqlite_name(i) for i in names), ", ".join("?" * len(names))
+        )
+        with self.lock:
+            self.conn.executemany(query, zip(*columns))
+        return len(columns[0]) if columns else 0
+
+    def _insert_query(self, query, database):
+        table, columns, rest = self._insert_target(query, database)
+        names = ", ".join(_sqlite_name(i.name) for i in columns)
+        if re.match(r"^(VALUES|FORMAT\s+\w+)?$", rest, re.I):
+            return _Result()
+        elif not re.match(r"^(VALUES|SELECT|WITH|\()", rest, re.I):
+            raise FakeServerError("Not supported INSERT query: {}".format(query))
+        sql, _ = self.translate(rest, database)
+        cursor = self.conn.execute("INSERT INTO {} ({}) {}".format(table.sql_name, names, sql))
+        return _Result(written_rows=cursor.rowcount)
+
+    def _create(self, query, database):
+        match = re.match(r"^CREATE\s+DATABASE\s+(IF\s+NOT\s+EXISTS\s+)?(%s)" % _NAME, query, re.I)
+        if match is not None:
+            db = _unquote(match.group(2))
+            if db in self.databases:
+                if match.group(1):
+                    return _Result()
+                raise FakeServerError(
+                    "Database {} already exists".format(db), DATABASE_ALREADY_EXISTS
+                )
+            self.databases[db] = {}
+            return _Result()
+
+        match = re.match(
+            r"^CREATE\s+(?:TEMPORARY\s+)?TABLE\s+(IF\s+NOT\s+EXISTS\s+)?" + _REF + r"\s*",
+            query,
+            re.I,
+        )
+        if match is None:
+            raise FakeServerError("Query is not supported: {}".format(query))
+        db, name = self._ref(match, database, 2)
+        self.table_names(db)
+        if name in self.databases[db]:
+            if match.group(1):
+                return _Result()
+            raise FakeServerError(
+                "Table {}.{} already exists".format(db, name), TABLE_ALREADY_EXISTS
+            )
+
+        rest = query[match.end() :]
+        source = re.match(r"^AS\s+" + _REF + r"\s*", rest, re.I)
+        if rest.startswith("("):
+            end = _closing_bracket(rest, 0)
+            columns = [
+                _parse_column(i)
+                for i in _split_expressions(rest[1:end])
+                if not re.match(r"^(INDEX|CONSTRAINT|PROJECTION)\b", i, re.I)
+            ]
+            engine, sorting_key, partition_key = "", [], []
+            rest = rest[end + 1 :]
+        elif source is not None:
+            origin = self.table(*self._ref(source, database))
+            columns = list(origin.columns)
+            engine = origin.engine
+            sorting_key, partition_key = origin.sorting_key, origin.partition_key
+            rest = rest[source.end() :]
+        else:
+            raise FakeServerError("Query is not supported: {}".format(query))
+
+        clauses = _split_top_level(
+            rest, r"\s*\b(?=(ENGINE|ORDER\s+BY|PARTITION\s+BY|PRIMARY\s+KEY|SAMPLE\s+BY|TTL|SETTINGS|AS)\b)"
+        )
+        for clause in clauses:
+            clause = clause.strip()
+            keyword = re.match(r"^(ENGINE|ORDER\s+BY|PARTITION\s+BY|AS)\b\s*=?\s*", clause, re.I)
+            if keyword is None:
+                continue
+            value = clause[keyword.end() :].strip()
+            keyword = " ".join(keyword.group(1).upper().split())
+            if keyword == "ENGINE":
+                engine = re.match(r"^\w+", value).group(0)
+            elif keyword == "ORDER BY":
+                sorting_key = _key_expressions(value)
+            elif keyword == "PARTITION BY":
+                partition_key = _key_expressions(value)
+            elif keyword == "AS":
+                raise FakeServerError("CREATE TABLE ... AS SELECT is not supported")
+
+        table = _Table(
+            db, name, columns, engine or "Memory", sorting_key, partition_key,
+            " ".join(query.split()),
+        )
+        self._create_sqlite_table(table)
+        self.databases[db][name] = table
+        return _Result()
+
+    def _drop(self, query, database):
+        match = re.match(
+            r"^DROP\s+(DATABASE|TABLE|VIEW|DICTIONARY)\s+(IF\s+EXISTS\s+)?" + _REF, query, re.I
+        )
+        if match is None:
+            raise FakeServerError("Query is not supported: {}".format(query))
+        if match.group(1).upper() == "DATABASE":
+            db = _unquote(match.group(3))
+            if db not in self.databases:
+                if match.group(2):
+                    return _Result()
+                raise FakeServerError("Database {} doesn't exist".format(db), UNKNOWN_DATABASE)
+            for table in list(self.databases[db].values()):
+                self.conn.execute("DROP TABLE {}".format(table.sql_name))
+            del self.databases[db]
+            self.mutations = [i for i in self.mutations if i[0] != db]
+            return _Result()
+
+        db, name = self._ref(match, database, 3)
+        if match.group(2) and name not in self.databases.get(db, {}):
+            return _Result()
+        table = self.table(db, name)
+        self.conn.execute("DROP TABLE {}".format(table.sql_name))
+        del self.databases[db][name]
+        self.mutations = [i for i in self.mutations if i[:2] != (db, name)]
+        return _Result()
+
+    def _rename(self, query, database):
+        match = re.match(r"^RENAME\s+TABLE\s+", query, re.I)
+        for pair in _split_expressions(query[match.end() :]):
+            names = re.match(r"^" + _REF + r"\s+TO\s+" + _REF + r"$", pair.strip(), re.I)
+            if names is None:
+                raise FakeServerError("Not valid RENAME query: {}".format(query), SYNTAX_ERROR)
+            table = self.table(*self._ref(names, database))
+            db, name = self._ref(names, database, 3)
+            self.table_names(db)
+            if name in self.databases[db]:
+                raise FakeServerError(
+                    "Table {}.{} already exists".format(db, name), TABLE_ALREADY_EXISTS
+                )
+            self.conn.execute(
+                "ALTER TABLE {} RENAME TO {}".format(table.sql_name, _sqlite_name(db, name))
+            )
+            del self.databases[table.db][table.name]
+            table.db, table.name = db, name
+            self.databases[db][name] = table
+        return _Result()
+
+    def _truncate(self, query, database):
+        match = re.match(r"^TRUNCATE\s+(?:TABLE\s+)?(IF\s+EXISTS\s+)?" + _REF, query, re.I)
+        db, name = self._ref(match, database, 2)
+        if match.group(1) and name not in self.databases.get(db, {}):
+            return _Result()
+        self.conn.execute("DELETE FROM {}".format(self.table(db, name).sql_name))
+        return _Result()
+
+    def _optimize(self, query, database):
+        match = re.match(
+            r"^OPTIMIZE\s+TABLE\s+" + _REF + r"(?:\s+ON\s+CLUSTER\s+\S+)?"
+            r"(?:\s+PARTITION\s+(.+?))?(\s+FINAL)?(\s+DEDUPLICATE)?$",
+            query,
+            re.I | re.S,
+        )
+        if match is None:
+            raise FakeServerError("Query is not supported: {}".format(query))
+        table = self.table(*self._ref(match, database))
+        if match.group(5):
+            # The data is not split into parts, only the deduplication is performed.
+            where = "1"
+            if match.group(3):
+                where = "_partition_id = {}".format(
+                    _sql_value(_partition_expression_id(match.group(3)))
+                )
+            self.conn.execute(
+                "DELETE FROM {0} WHERE {1} AND rowid NOT IN "
+                "(SELECT min(rowid) FROM {0} WHERE {1} GROUP BY {2})".format(
+                    table.sql_name, where, ", ".join(_sqlite_name(i.name) for i in table.ordinary())
+                )
+            )
+        return _Result()
+
+    def _exists(self, query, database):
+        match = re.match(
+            r"^(EXISTS|CHECK)\s+(?:TEMPORARY\s+)?(?:TABLE\s+)?" + _REF, query, re.I
+        )
+        db, name = self._ref(match, database, 2)
+        if match.group(1).upper() == "CHECK":
+            self.table(db, name)
+            return _Result([("result", "UInt8")], [[1]])
+        exists = int(name in self.databases.get(db, {}))
+        return _Result([("result", "UInt8")], [[exists]])
+
+    def _describe(self, query, database):
+        match = re.match(r"^DESC(?:RIBE)?\s+(?:TABLE\s+)?" + _REF, query, re.I)
+        table = self.table(*self._ref(match, database))
+        names = [
+            "name", "type", "default_type", "default_expression",
+            "comment", "codec_expression", "ttl_expression",
+        ]  # fmt: skip
+        rows = [
+            (i.name, i.type, i.default_kind, i.default_expression, i.comment, "", "")
+            for i in table.columns
+        ]
+        return _Result(
+            [(i, "String") for i in names], [list(i) for i in zip(*rows)] or [[]] * len(names)
+        )
+
+    def _show(self, query, database):
+        if re.match(r"^SHOW\s+DATABASES\b", query, re.I):
+            return _Result([("name", "String")], [sorted(self.databases)])
+        elif re.match(r"^SHOW\s+PROCESSLIST\b", query, re.I):
+            return _Result([("query_id", "String"), ("query", "String")], [[], []])
+
+        match = re.match(r"^SHOW\s+CREATE\s+(?:TABLE\s+)?" + _REF, query, re.I)
+        if match is not None:
+            table = self.table(*self._ref(match, database))
+            return _Result([("statement", "String")], [[table.create_query]])
+
+        match = re.match(
+            r"^SHOW\s+TABLES(?:\s+(?:FROM|IN)\s+(%s))?(?:\s+(NOT\s+)?LIKE\s+('.*'))?$" % _NAME,
+            query,
+            re.I | re.S,
+        )
+        if match is None:
+            raise FakeServerError("Query is not supported: {}".format(query))
+        names = self.table_names(_unquote(match.group(1)) if match.group(1) else database)
+        if match.group(3):
+            pattern = re.escape(_parse_literal(match.group(3)))
+            pattern = pattern.replace("%", ".*").replace("_", ".")
+            names = [i for i in names if bool(re.match("^{}$".format(pattern), i, re.S)) != bool(match.group(2))]
+        return _Result([("name", "String")], [names])
+
+    def _attach(self, query, database):
+        match = re.match(
+            r"^(ATTACH|DETACH)\s+TABLE\s+(IF\s+(?:NOT\s+)?EXISTS\s+)?" + _REF, query, re.I
+        )
+        if match is None:
+            raise FakeServerError("Query is not supported: {}".format(query))
+        db, name = self._ref(match, database, 3)
+        if match.group(1).upper() == "DETACH":
+            if match.group(2) and name not in self.databases.get(db, {}):
+                return _Result()
+            self.detached[(db, name)] = self.databases[db].pop(self.table(db, name).name)
+        else:
+            table = self.detached.pop((db, name), None)
+            if table is None:
+                if match.group(2):
+                    return _Result()
+                raise FakeServerError("Table {}.{} is not detached".format(db, name), UNKNOWN_TABLE)
+            self.databases[db][name] = table
+        return _Result()
+
+    def _alter(self, query, database):
+        match = re.match(
+            r"^ALTER\s+TABLE\s+" + _REF + r"\s+(?:ON\s+CLUSTER\s+\S+\s+)?", query, re.I
+        )
+        if match is None:
+            raise FakeServerError("Query is not supported: {}".format(query))
+        table = self.table(*self._ref(match, database))
+        commands = query[match.end() :]
+        mutation = None
+        for command in _split_top_level(
+            commands,
+            r",\s*(?=(UPDATE|DELETE|ADD|DROP|MODIFY|CLEAR|COMMENT|RENAME|REPLACE|MOVE)\b)",
+        ):
+            command = command.strip()
+            keyword = command.split(None, 1)[0].upper()
+            if keyword in ("UPDATE", "DELETE"):
+                mutation = mutation or keyword
+                self._mutate(table, command, database)
+            elif re.match(r"^\w+\s+COLUMN\b", command, re.I):
+                self._alter_column(table, command, database)
+            elif re.match(r"^(DROP|REPLACE|MOVE)\s+PARTITION\b", command, re.I):
+                self._alter_partition(table, command, database)
+            else:
+                raise FakeServerError("ALTER command is not supported: {}".format(command))
+
+        if mutation is not None:
+            self.mutation_number += 1
+            self.mutations.append(
+                (
+                    table.db,
+                    table.name,
+                    "mutation_{}.txt".format(self.mutation_number),
+                    commands[commands.upper().find(mutation) :],
+                    dt.datetime.utcnow().replace(microsecond=0),
+                    time.monotonic() + self.mutation_delay,
+                )
+            )
+        return _Result()
+
+    def _mutate(self, table, command, database):
+        match = re.match(r"^(UPDATE\s+(.+?)|DELETE)\s+WHERE\s+(.+)$", command, re.I | re.S)
+        if match is None:
+            raise FakeServerError("Not valid mutation: {}".format(command), SYNTAX_ERROR)
+        where, _ = self.translate(match.group(3), database)
+        if match.group(2) is None:
+            self.conn.execute("DELETE FROM {} WHERE {}".format(table.sql_name, where))
+            return
+
+        assignments = []
+        for assignment in _split_expressions(match.group(2)):
+            name, _, expression = assignment.partition("=")
+            expression, _ = self.translate(expression, database)
+            assignments.append("{} = {}".format(_sqlite_name(_unquote(name)), expression))
+        self.conn.execute(
+            "UPDATE {} SET {} WHERE {}".format(table.sql_name, ", ".join(assignments), where)
+        )
+
+    def _alter_column(self, table, command, database):
+        match = re.match(
+            r"^(\w+)\s+COLUMN\s+(IF\s+(?:NOT\s+)?EXISTS\s+)?(%s)\s*(.*)$" % _NAME,
+            command,
+            re.I | re.S,
+        )
+        method, if_exists, name = match.group(1).upper(), match.group(2), _unquote(match.group(3))
+        rest = match.group(4).strip()
+        column = table.column(name)
+
+        if method == "ADD":
+            if column is not None:
+                if if_exists:
+                    return
+                raise FakeServerError(
+                    "Column {} already exists".format(name), UNKNOWN_IDENTIFIER
+                )
+            rest = re.sub(r"\s+(AFTER\s+%s|FIRST)\s*$" % _NAME, "", " " + rest, flags=re.I)
+            position = re.search(r"\b(AFTER\s+(%s)|FIRST)\s*$" % _NAME, command, re.I)
+            column = _parse_column("{} {}".format(_sqlite_name(name), rest))
+            self.conn.execute(
+                "ALTER TABLE {} ADD COLUMN {}".format(table.sql_name, self._column_sql(table, column))
+            )
+            index = len(table.columns)
+            if position is not None:
+                after = table.column(_unquote(position.group(2) or ""))
+                index = table.columns.index(after) + 1 if after is not None else 0
+            table.columns.insert(index, column)
+            return
+
+        if column is None:
+            if if_exists:
+                return
+            raise FakeServerError(
+                "There is no column {} in table {}.{}".format(name, table.db, table.name),
+                UNKNOWN_IDENTIFIER,
+            )
+        if method == "DROP":
+            self.conn.execute(
+                "ALTER TABLE {} DROP COLUMN {}".format(table.sql_name, _sqlite_name(name))
+            )
+            table.columns.remove(column)
+        elif method == "CLEAR":
+            where = "1"
+            partition = re.match(r"^IN\s+PARTITION\s+(.+)$", rest, re.I | re.S)
+            if partition is not None:
+                where = "_partition_id = {}".format(
+                    _sql_value(_partition_expression_id(partition.group(1)))
+                )
+            self.conn.execute(
+                "UPDATE {} SET {} = {} WHERE {}".format(
+                    table.sql_name, _sqlite_name(name), _sql_value(_default_value(column.type)), where
+                )
+            )
+        elif method == "COMMENT":
+            table.set_column(column._replace(comment=_parse_literal(rest)))
+        elif method == "MODIFY":
+            modified = _parse_column("{} {}".format(_sqlite_name(name), rest))
+            # The values are kept, they are converted to the new type when selected.
+            table.set_column(
+                column._replace(
+                    type=modified.type or column.type,
+                    default_kind=modified.default_kind or column.default_kind,
+                    default_expression=modified.default_expression or column.default_expression,
+                )
+            )
+        elif method == "RENAME":
+            to = re.match(r"^TO\s+(%s)$" % _NAME, rest, re.I)
+            new_name = _unquote(to.group(1))
+            self.conn.execute(
+                "ALTER TABLE {} RENAME COLUMN {} TO {}".format(
+                    table.sql_name, _sqlite_name(name), _sqlite_name(new_name)
+                )
+            )
+            table.set_column(column._replace(name=new_name))
+        else:
+            raise FakeServerError("ALTER command is not supported: {}".format(command))
+
+    def _alter_partition(self, table, command, database):
+        move = re.match(
+            r"^MOVE\s+PARTITION\s+(.+?)\s+TO\s+TABLE\s+" + _REF + r"$", command, re.I | re.S
+        )
+        if move is not None:
+            target = self.table(*self._ref(move, database, 2))
+            partition_id = _sql_value(_partition_expression_id(move.group(1)))
+            names = ", ".join(_sqlite_name(i.name) for i in table.ordinary())
+            self.conn.execute(
+                "INSERT INTO {0} ({2}) SELECT {2} FROM {1} WHERE _partition_id = {3}".format(
+                    target.sql_name, table.sql_name, names, partition_id
+                )
+            )
+            self.conn.execute(
+                "DELETE FROM {} WHERE _partition_id = {}".format(table.sql_name, partition_id)
+            )
+            return
+
+        match = re.match(
+            r"^(DROP|REPLACE)\s+PARTITION\s+(.+?)(?:\s+FROM\s+" + _REF + r")?$",
+            command,
+            re.I | re.S,
+        )
+        partition_id = _sql_value(_partition_expression_id(match.group(2)))
+        self.conn.execute(
+            "DELETE FROM {} WHERE _partition_id = {}".format(table.sql_name, partition_id)
+        )
+        if match.group(1).upper() == "REPLACE":
+            source = self.table(*self._ref(match, database, 3))
+            names = ", ".join(_sqlite_name(i.name) for i in table.ordinary())
+            self.conn.execute(
+                "INSERT INTO {0} ({2}) SELECT {2} FROM {1} WHERE _partition_id = {3}".format(
+                    table.sql_name, source.sql_name, names, partition_id
+                )
+            )
+
+    # System tables.
+
+    def _refresh_system(self):
+        rows = {name: [] for name in _SYSTEM_TABLES}
+        rows["one"].append((0,))
+        rows["databases"] = [(i, "Memory") for i in sorted(self.databases)]
+        now = time.monotonic()
+        for db, table, mutation_id, command, create_time, done_at in self.mutations:
+            is_done = int(now >= done_at)
+            rows["mutations"].append(
+                (db, table, mutation_id, command, create_time.isoformat(" "),
+                 1 - is_done, is_done, 0, "", "1970-01-01 00:00:00", "")
+            )  # fmt: skip
+
+        for db in sorted(self.databases):
+            if db == "system":
+                continue
+            for table in self.databases[db].values():
+                self._refresh_table(table, rows)
+
+        for name, values in rows.items():
+            table = self.databases["system"][name]
+            self.conn.execute("DELETE FROM {}".format(table.sql_name))
+            if values:
+                self.conn.executemany(
+                    "INSERT INTO {} VALUES ({})".format(
+                        table.sql_name, ", ".join("?" * len(table.columns))
+                    ),
+                    values,
+                )
+
+    def _column_size(self, column):
+        base, _ = _base_type(column.type)
+        size = _TYPE_SIZES.get(base.split("(")[0])
+        name = _sqlite_name(column.name)
+        if size is not None:
+            return "count({}) * {}".format(name, size)
+        return "coalesce(sum(length(CAST({} AS BLOB)) + 1), 0)".format(name)
+
+    def _refresh_table(self, table, rows):
+        columns = table.ordinary()
+        key_names = set(re.findall(r"\w+", " ".join(table.partition_key)))
+        dates = [i for i in columns if i.name in key_names and _base_type(i.type)[0] == "Date"]
+        times = [
+            i for i in columns if i.name in key_names and _base_type(i.type)[0].startswith("DateTime")
+        ]
+        expressions = ["count()", " + ".join([self._column_size(i) for i in columns]) or "0"]
+        for limits in (dates, times):
+            if limits:
+                name = _sqlite_name(limits[0].name)
+                expressions += ["min({})".format(name), "max({})".format(name)]
+            else:
+                expressions += ["NULL", "NULL"]
+        keys = [self.translate(i, table.db)[0] for i in table.partition_key]
+        expressions += ["min({})".format(i) for i in keys]
+
+        total_rows = total_bytes = 0
+        query = "SELECT _partition_id, {} FROM {} GROUP BY _partition_id ORDER BY _partition_id"
+        for row in self.conn.execute(query.format(", ".join(expressions), table.sql_name)):
+            partition_id, count, size, min_date, max_date, min_time, max_time = row[:7]
+            values = row[7:]
+            if len(values) == 1:
+                partition = str(values[0])
+            else:
+                partition = "({})".format(", ".join(_sql_value(i) for i in values))
+            rows["parts"].append(
+                (
+                    table.db, table.name, partition, partition_id,
+                    "{}_1_1_0".format(partition_id), 1, count, size, size, size,
+                    (min_date or "1970-01-01")[:10], (max_date or "1970-01-01")[:10],
+                    min_time or "1970-01-01 00:00:00", max_time or "1970-01-01 00:00:00", 0,
+                )
+            )  # fmt: skip
+            total_rows += count
+            total_bytes += size
+
+        rows["tables"].append(
+            (
+                table.db, table.name, table.engine, 0, table.create_query,
+                ", ".join(table.partition_key), ", ".join(table.sorting_key),
+                ", ".join(table.sorting_key), total_rows, total_bytes,
+            )
+        )  # fmt: skip
+
+        sizes = [0] * len(table.columns)
+        if table.columns:
+            query = "SELECT {} FROM {}".format(
+                ", ".join(
+                    self._column_size(i) if i in columns else "0" for i in table.columns
+                ),
+                table.sql_name,
+            )
+            sizes = self.conn.execute(query).fetchone()
+        sorting_names = set(re.findall(r"\w+", " ".join(table.sorting_key)))
+        for position, (column, size) in enumerate(zip(table.columns, sizes), 1):
+            rows["columns"].append(
+                (
+                    table.db, table.name, column.name, column.type, position,
+                    column.default_kind, column.default_expression, size, size, 0,
+                    column.comment, int(column.name in key_names),
+                    int(column.name in sorting_names), int(column.name in sorting_names),
+                )
+            )  # fmt: skip
+
+
+class _Connection(object):
+    """Native protocol of one client connection."""
+
+    def __init__(self, server, sock):
+        self.server = server
+        self.sock = sock
+        self.fin = BufferedSocketReader(sock, defines.BUFFER_SIZE)
+        self.fout = BufferedSocketWriter(sock, defines.BUFFER_SIZE)
+        self.database = "default"
+        self.context = Context()
+        self.context.settings = {}
+        self.context.client_settings = {
+            "strings_as_bytes": False,
+            "strings_encoding": defines.STRINGS_ENCODING,
+            "use_numpy": False,
+            "input_format_null_as_default": False,
+            "namedtuple_as_json": False,
+        }
+        self.block_in = BlockInputStream(self.fin, self.context)
+        self.block_out = BlockOutputStream(self.fout, self.context)
+
+    def run(self):
+        try:
+            if not self.receive_hello():
+                return
+            while True:
+                packet_type = read_varint(self.fin)
+                if packet_type == ClientPacketTypes.QUERY:
+                    self.receive_query()
+                elif packet_type == ClientPacketTypes.PING:
+                    write_varint(ServerPacketTypes.PONG, self.fout)
+                    self.fout.flush()
+                elif packet_type == ClientPacketTypes.CANCEL:
+                    continue
+                else:
+                    logging.warning("Fake server: unknown packet {}".format(packet_type))
+                    return
+        except (EOFError, OSError):
+            pass
+        finally:
+            self.sock.close()
+
+    def receive_hello(self):
+        if read_varint(self.fin) != ClientPacketTypes.HELLO:
+            return False
+        read_binary_str(self.fin)  # client name
+        read_varint(self.fin)  # major version
+        read_varint(self.fin)  # minor version
+        revision = min(read_varint(self.fin), REVISION)
+        database = read_binary_str(self.fin)
+        read_binary_str(self.fin)  # user
+        read_binary_str(self.fin)  # password
+
+        self.context.server_info = ServerInfo(
+            "ClickHouse", VERSION[0], VERSION[1], VERSION[2], REVISION,
+            self.server.timezone, "fake", revision,
+        )  # fmt: skip
+        if database and database not in self.server.store.databases:
+            self.send_exception(
+                FakeServerError("Database {} doesn't exist".format(database), UNKNOWN_DATABASE)
+            )
+            return False
+        self.database = database or "default"
+
+        write_varint(ServerPacketTypes.HELLO, self.fout)
+        write_binary_str("ClickHouse", self.fout)
+        write_varint(VERSION[0], self.fout)
+        write_varint(VERSION[1], self.fout)
+        write_varint(REVISION, self.fout)
+        write_binary_str(self.server.timezone, self.fout)
+        write_binary_str("fake", self.fout)
+        write_varint(VERSION[2], self.fout)
+        self.fout.flush()
+        return True
+
+    def receive_query(self):
+        revision = self.context.server_info.used_revision
+        read_binary_str(self.fin)  # query_id
+        if revision >= defines.DBMS_MIN_REVISION_WITH_CLIENT_INFO:
+            self.receive_client_info(revision)
+
+        settings = {}
+        while True:
+            name = read_binary_str(self.fin)
+            if not name:
+                break
+            read_binary_uint8(self.fin)  # flags
+            settings[name] = read_binary_str(self.fin)
+
+        read_varint(self.fin)  # stage
+        compression = read_varint(self.fin)
+        query = read_binary_str(self.fin)
+
+        # External tables, the empty block is the end of them.
+        while True:
+            if read_varint(self.fin) != ClientPacketTypes.DATA:
+                raise EOFError("Data packet is expected")
+            if self.receive_block().num_columns == 0:
+                break
+
+        start = time.monotonic()
+        try:
+            if compression:
+                raise FakeServerError("Compression is not supported")
+            result = self.process(query, settings)
+        except FakeServerError as e:
+            self.send_exception(e)
+        except Exception as e:
+            logging.exception("Fake server: query failed: {}".format(query))
+            self.send_exception(FakeServerError(repr(e), STD_EXCEPTION))
+        else:
+            if result.database is not None:
+                self.database = result.database
+            self.send_result(result, int(settings.get("max_block_size", 65536)))
+        logging.debug("Fake server: {:.3f} sec: {}".format(time.monotonic() - start, query))
+
+    def receive_client_info(self, revision):
+        if read_binary_uint8(self.fin) == 0:  # query kind, no query
+            return
+        for _ in range(3):  # initial user, query_id, address
+            read_binary_str(self.fin)
+        read_binary_uint8(self.fin)  # interface
+        for _ in range(3):  # os user, hostname, client name
+            read_binary_str(self.fin)
+        for _ in range(3):  # client version and revision
+            read_varint(self.fin)
+        if revision >= defines.DBMS_MIN_REVISION_WITH_QUOTA_KEY_IN_CLIENT_INFO:
+            read_binary_str(self.fin)
+        if revision >= defines.DBMS_MIN_REVISION_WITH_VERSION_PATCH:
+            read_varint(self.fin)
+
+    def receive_block(self):
+        read_binary_str(self.fin)  # table name
+        return self.block_in.read()
+
+    def process(self, query, settings):
+        store = self.server.store
+        target = None
+        if re.match(r"^\s*INSERT\b", query, re.I):
+            target = store.insert_columns(query, self.database)
+        if target is None:
+            return store.execute(query, self.database)
+
+        # The data of the INSERT query is received in blocks after the sample block.
+        table, columns = target
+        self.send_block([(i.name, i.type) for i in columns], [[] for _ in columns])
+        blocks = []
+        while True:
+            if read_varint(self.fin) != ClientPacketTypes.DATA:
+                raise EOFError("Data packet is expected")
+            block = self.receive_block()
+            if block.num_columns == 0 and block.num_rows == 0:
+                break
+            blocks.append(block)
+
+        written = 0
+        for block in blocks:
+            names = [name for name, _ in block.columns_with_types]
+            written += store.insert_rows(table, names, block.get_columns())
+        return _Result(written_rows=written)
+
+    def send_block(self, columns_with_types, columns):
+        write_varint(ServerPacketTypes.DATA, self.fout)
+        write_binary_str("", self.fout)
+        self.block_out.write(ColumnOrientedBlock(columns_with_types, columns))
+
+    def send_result(self, result, block_size):
+        if result.columns_with_types:
+            # The header block with the names and types of the columns.
+            self.send_block(result.columns_with_types, [[] for _ in result.columns])
+            for start in range(0, result.rows, block_size):
+                self.send_block(
+                    result.columns_with_types,
+                    [i[start : start + block_size] for i in result.columns],
+                )
+
+        width = len(result.columns_with_types)
+        write_varint(ServerPacketTypes.PROGRESS, self.fout)
+        for value in (
+            result.read_rows,
+            result.read_rows * width * 8,  # approximate bytes
+            result.read_rows,
+            result.written_rows,
+            result.written_rows * 8,
+        ):
+            write_varint(value, self.fout)
+        write_varint(ServerPacketTypes.END_OF_STREAM, self.fout)
+        self.fout.flush()
+
+    def send_exception(self, error):
+        write_varint(ServerPacketTypes.EXCEPTION, self.fout)
+        write_binary_int32(error.code, self.fout)
+        write_binary_str("DB::Exception", self.fout)
+        write_binary_str("DB::Exception: {}".format(error), self.fout)
+        write_binary_str("", self.fout)  # stack trace
+        write_binary_uint8(0, self.fout)  # no nested exception
+        self.fout.flush()
+
+
+class FakeServer(object):
+    """
+    Local stand-in for ClickHouse for tests and benchmarks without a real server.
+
+    Speaks the native protocol (hello, ping, query, data blocks, progress, exceptions)
+    without compression. Tables are stored in memory in SQLite, so the queries
+    are executed with SQLite semantics: the library's own queries, simple SELECTs
+    with WHERE, GROUP BY, ORDER BY and LIMIT, DDL of databases, tables and columns,
+    mutations, partitions and system.tables, columns, parts, mutations are supported,
+    but not ClickHouse specific functions and types beyond the common ones.
+    Mutations are applied at once and are reported as done after mutation_delay seconds.
+
+        with FakeServer() as server:
+            client = server.client()
+            client.create_db("test")
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, timezone="UTC", mutation_delay=0):
+        """
+
+        :param host: str
+        :param port: int : 0 - any free port
+        :param timezone: str : timezone of the server
+        :param mutation_delay: int, float : seconds until the mutation is done in system.mutations
+        """
+        self.host = host
+        self.timezone = timezone
+        self.store = _Store(mutation_delay)
+        self._port = port
+        self._socket = None
+        self._thread = None
+        self._connections = set()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    @property
+    def port(self):
+        return self._port
+
+    def start(self):
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind((self.host, self._port))
+        self._socket.listen(64)
+        self._socket.settimeout(0.1)
+        self._port = self._socket.getsockname()[1]
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._accept, name="FakeServer:{}".format(self._port), daemon=True
+        )
+        self._thread.start()
+        logging.info("Fake ClickHouse server is listening on {}:{}".format(self.host, self._port))
+        return self
+
+    def _accept(self):
+        while not self._stopped.is_set():
+            try:
+                sock, _ = self._socket.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            sock.settimeout(None)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            with self._lock:
+                self._connections.add(sock)
+            threading.Thread(target=self._serve, args=(sock,), daemon=True).start()
+        self._socket.close()
+
+    def _serve(self, sock):
+        try:
+            _Connection(self, sock).run()
+        finally:
+            with self._lock:
+                self._connections.discard(sock)
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        with self._lock:
+            for sock in list(self._connections):
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+    def client(self, **kwargs):
+        """
+        :param kwargs: Parameters accepted by Client
+        :return: Client connected to the server
+        """
+        return Client(self.host, port=self._port, **kwargs)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
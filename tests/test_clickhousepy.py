@@ -0,0 +1,1136 @@
+import datetime as dt
+import os
+import time
+from importlib.util import find_spec
+from pprint import pprint
+
+import pytest
+import yaml
+
+from clickhousepy import Client
+
+if os.path.exists("config.yml"):
+    with open("config.yml", "r") as stream:
+        data_loaded = yaml.safe_load(stream)
+
+    CLIENT_KWARGS = {
+        "host": data_loaded["host"],
+        "user": data_loaded["user"],
+        "password": data_loaded["password"],
+    }
+else:
+    # Without a real server the tests are run against the local stand-in.
+    from tests.fake_server import FakeServer
+
+    fake_server = FakeServer().start()
+    CLIENT_KWARGS = {"host": fake_server.host, "port": fake_server.port}
+
+client = Client(**CLIENT_KWARGS)
+
+# The tests depend on the semantics of the server, that FakeServer only imitates:
+# partition ids, moving partitions, the ids and the completion of mutations.
+# They are run against a real ClickHouse, set in config.yml.
+real_clickhouse = pytest.mark.skipif(
+    not os.path.exists("config.yml"), reason="needs a real ClickHouse in config.yml"
+)
+
+TEST_DB = "__chpytest12345"
+TEST_TABLE = "__chpytest12345"
+
+
+def _decorator_function(func):
+    # Before starting the function, it creates a database and a table with data,
+    # and deletes it when exiting the function.
+    def wrapper():
+        client.drop_db(TEST_DB)
+        db = client.create_db(TEST_DB)
+        table = db.create_table_mergetree(
+            TEST_TABLE,
+            columns=["string String", "integer UInt32", "dt DateTime"],
+            orders=["string"],
+            partition=["string"],
+        )
+        table.insert(
+            [
+                {"string": "a", "integer": 1, "dt": dt.datetime(2000, 1, 1)},
+                {"string": "b", "integer": 2, "dt": dt.datetime(2000, 1, 2)},
+                {"string": "c", "integer": 3, "dt": dt.datetime(2000, 1, 3)},
+                {"string": "c", "integer": 3, "dt": dt.datetime(2000, 1, 3)},
+            ],
+        )
+        func(db, table)
+        db.drop_db(TEST_DB)
+
+    return wrapper
+
+
+@_decorator_function
+def test_decorator_function(db, table):
+    pass
+
+
+@_decorator_function
+def test_add_column(db, table):
+    table.add_column("new_col", "UInt32", after="integer")
+    print(table.describe())
+
+
+@_decorator_function
+def test_drop_column(db, table):
+    table.drop_column("dt")
+    print(table.describe())
+
+
+@_decorator_function
+def test_clear_column(db, table):
+    table.clear_column("integer", partition="tuple('c')")
+    print(table.select())
+
+
+@_decorator_function
+def test_comment_column(db, table):
+    table.comment_column("string", "string column")
+    print(table.describe())
+
+
+@_decorator_function
+def test_modify_column(db, table):
+    print(table.describe())
+    table.modify_column("integer", "UInt8")
+    print(table.describe())
+
+
+@_decorator_function
+def test_deduplicate_data(db, table):
+    print(table.select())
+    table.deduplicate_data(where="toDate(dt) = '2000-01-03' ")
+    print(table.select())
+    assert table.get_count_rows() == 3
+
+
+@_decorator_function
+def test_deduplicate_data_whole_table(db, table):
+    assert table.deduplicate_data(strategy="replace")
+    assert table.get_count_rows() == 3
+
+    table.insert([{"string": "c", "integer": 3, "dt": dt.datetime(2000, 1, 3)}])
+    assert table.deduplicate_data()
+    assert table.get_count_rows() == 3
+
+    table2 = db.create_table_log(TEST_TABLE + "_log", columns=["i Int32"])
+    table2.insert([{"i": 1}, {"i": 1}, {"i": 2}])
+    assert table2.deduplicate_data()
+    assert sorted(table2.select(columns=["i"])) == [(1,), (2,)]
+
+
+@real_clickhouse
+@_decorator_function
+def test_deduplicate_data_strategies(db, table):
+    assert table.deduplicate_data(strategy="optimize")
+    assert table.get_count_rows() == 3
+
+    table.insert([{"string": "c", "integer": 3, "dt": dt.datetime(2000, 1, 3)}])
+    assert table.deduplicate_data(where="integer = 3", strategy="copy")
+    assert table.get_count_rows() == 3
+
+    # Negative partition ids are not valid in the name of the stage table.
+    table2 = db.create_table_mergetree(
+        TEST_TABLE + "_int", columns=["i Int32"], orders=["i"], partition=["i"]
+    )
+    table2.insert([{"i": -1}, {"i": -1}, {"i": 1}])
+    assert table2.deduplicate_data(where="i < 0", strategy="replace")
+    assert table2.select(columns=["i"], order_by="i") == [(-1,), (1,)]
+
+
+@_decorator_function
+def test_get_methods(db, table):
+    print(table.get_count_rows())
+    print(table.get_min_date(date_column_name="dt"))
+    print(table.get_max_date(date_column_name="dt"))
+    print(table.get_count_run_mutations())
+
+
+@_decorator_function
+def test_copy_data(db, table):
+    table_name_2 = TEST_TABLE + "_copy"
+    client.drop_table(TEST_DB, table_name_2)
+    table2 = table.copy_table(TEST_DB, table_name_2, return_new_table=True)
+    is_identic = table2.copy_data_from(
+        TEST_DB, TEST_TABLE,
+        where="string != 'c' ",
+        columns=["string"]
+    )
+    # Checking the identity of the data copy.
+    print(
+        table2.select(columns=["string"])
+    )
+    assert is_identic
+    # Checking the removal of duplicate lines when copying.
+    table2.truncate()
+    table2.copy_data_from(
+        TEST_DB, TEST_TABLE,
+        columns=["string"],
+        distinct=True
+    )
+    assert 3 == table2.get_count_rows()
+
+
+@_decorator_function
+def test_copy_data_verify(db, table):
+    table_name_2 = TEST_TABLE + "_copy"
+    table2 = table.copy_table(TEST_DB, table_name_2, return_new_table=True)
+    events = []
+    handle = client.add_hook(after=events.append)
+    try:
+        assert table2.copy_data_from(
+            TEST_DB, TEST_TABLE, where="string != 'c'", verify="written"
+        )
+    finally:
+        client.remove_hook(handle)
+    # The rows written by the INSERT itself, not by the following count query.
+    inserts = [i for i in events if i.query.lstrip().startswith("INSERT")]
+    assert [i.written_rows for i in inserts] == [2]
+    assert table2.get_count_rows() == 2
+    assert table2.copy_data_from(TEST_DB, TEST_TABLE)
+    assert table2.copy_data_from(TEST_DB, TEST_TABLE, verify=None) is None
+    assert table2.get_count_rows() == 10
+
+    assert table.insert_via_stage_table(
+        [("d", 4, dt.datetime(2000, 1, 4))], stage_db=TEST_DB
+    )
+    assert table.get_count_rows() == 5
+
+
+@real_clickhouse
+@_decorator_function
+def test_copy_data_parallel(db, table):
+    table_name_2 = TEST_TABLE + "_copy"
+    table2 = table.copy_table(TEST_DB, table_name_2, return_new_table=True)
+    assert table2.copy_data_from(TEST_DB, TEST_TABLE, parallel="partition", workers=2)
+    assert table2.copy_data_from(TEST_DB, TEST_TABLE, parallel="hash", hash_buckets=3)
+    assert table2.get_count_rows() == 8
+
+    results = table2.insert_transform_from_table(TEST_DB, TEST_TABLE, parallel="partition")
+    assert len(results) == 3
+    assert sum(i.written_rows for i in results) == 4
+
+
+@_decorator_function
+def test_copy_data_parallel_hash(db, table):
+    from unittest import mock
+
+    execute = client.execute
+    calls = []
+
+    def record(query, *args, **kwargs):
+        calls.append((query, kwargs.get("settings")))
+        return execute(query, *args, **kwargs)
+
+    table2 = table.copy_table(TEST_DB, TEST_TABLE + "_copy", return_new_table=True)
+    settings = {"max_threads": 2}
+    with mock.patch.object(client, "execute", record):
+        assert table2.copy_data_from(
+            TEST_DB, TEST_TABLE, parallel="hash", hash_buckets=3, settings=settings
+        )
+    # The slices are inserted through stage tables and moved by MOVE PARTITION.
+    assert [i for i, _ in calls if "_slice_" in i and i.startswith("INSERT")]
+    assert [i for i, _ in calls if "MOVE PARTITION" in i]
+    assert [i for i, s in calls if s != settings] == []
+    assert sorted(table2.select(columns=["string", "integer"])) == [
+        ("a", 1), ("b", 2), ("c", 3), ("c", 3)
+    ]
+    assert client.show_tables(TEST_DB, like="%_slice_%") == []
+
+
+@real_clickhouse
+@_decorator_function
+def test_copy_data_retry(db, table):
+    from unittest import mock
+
+    execute = client.execute
+    failed = []
+
+    def fail_once(query, *args, **kwargs):
+        # The first slice fails after inserting a part of its rows.
+        if query.startswith("INSERT") and "_slice_" in query and not failed:
+            failed.append(query)
+            execute(query + " LIMIT 1", *args, **kwargs)
+            raise ConnectionError("Connection lost")
+        return execute(query, *args, **kwargs)
+
+    table2 = table.copy_table(TEST_DB, TEST_TABLE + "_copy", return_new_table=True)
+    with mock.patch.object(client, "execute", fail_once):
+        results = client.insert_transform_from_table(
+            TEST_DB, TEST_TABLE, TEST_DB, table2.table, parallel="partition", workers=1
+        )
+    assert failed and sorted(i.attempts for i in results) == [1, 1, 2]
+    assert table2.get_count_rows() == 4
+    assert client.show_tables(TEST_DB, like="%_slice_%") == []
+
+
+@real_clickhouse
+@_decorator_function
+def test_drop_partitions_str(db, table):
+    table.drop_partitions([["b"], ["c"]])
+    time.sleep(1)
+    assert table.get_count_rows() == 1
+    table.truncate()
+    assert table.get_count_rows() == 0
+
+
+@real_clickhouse
+def test_drop_partitions_list():
+    client.drop_db(TEST_DB)
+    client.create_db(TEST_DB)
+    client.create_table_mergetree(
+        TEST_DB,
+        TEST_TABLE,
+        columns=["s String", "d Date"],
+        orders=["s"],
+        partition=["s", "d"],
+    )
+    t = client.Table(TEST_DB, TEST_TABLE)
+    t.insert(
+        [
+            {"s": "S1", "d": dt.datetime(2000, 1, 1)},
+            {"s": "S2", "d": dt.datetime(2000, 1, 2)},
+            {"s": "S3", "d": dt.datetime(2000, 1, 3)},
+        ],
+        columns=["s", "d"],
+    )
+    t.drop_partitions([["S2", "2000-01-02"], ["S3", "2000-01-03"]])
+    time.sleep(1)
+    assert t.get_count_rows() == 1
+    t.truncate()
+    assert t.get_count_rows() == 0
+    client.drop_db(TEST_DB)
+
+
+def test_connection_pool():
+    from concurrent.futures import ThreadPoolExecutor
+
+    tables = [client.Table(TEST_DB, TEST_TABLE) for _ in range(1000)]
+    with ThreadPoolExecutor(max_workers=20) as executor:
+        r = list(executor.map(lambda t: t.execute("SELECT 1")[0][0], tables))
+    assert sum(r) == 1000
+
+    stats = client.pool_stats()
+    pprint(stats)
+    assert stats["size"] <= stats["max_size"]
+    assert stats["in_use"] == 0
+
+    # Methods of the driver client are executed by a client of the pool.
+    progress = client.execute_with_progress("SELECT 1")
+    assert client.pool_stats()["in_use"] == 1
+    for _ in progress:
+        pass
+    assert progress.get_result() == [(1,)]
+    assert client.pool_stats()["in_use"] == 0
+    try:
+        client.unknown_method
+    except AttributeError:
+        pass
+    else:
+        raise AssertionError("Exception is expected")
+
+    # As the driver client, the client can be used after disconnect.
+    client.disconnect()
+    assert client.execute("SELECT 1") == [(1,)]
+
+
+@_decorator_function
+def test_metadata_cache(db, table):
+    cached_client = Client(
+        **CLIENT_KWARGS,
+        metadata_cache_ttl=60,
+    )
+    table = cached_client.Table(table.db, table.table)
+    describe = table.describe()
+    assert table.describe() == describe
+    assert cached_client.metadata_cache.stats()["hits"] == 1
+
+    table.add_column("new_col", "UInt32")
+    assert len(table.describe()) == len(describe) + 1
+    assert TEST_TABLE in cached_client.show_tables(TEST_DB)
+
+    table.drop_table()
+    assert not table.exists()
+    cached_client.disconnect()
+
+
+@_decorator_function
+def test_result_cache(db, table):
+    cached_client = Client(
+        **CLIENT_KWARGS,
+        result_cache_size=10 * 2 ** 20,
+    )
+    table = cached_client.Table(table.db, table.table)
+    assert table.get_count_rows(cache_ttl=60) == 4
+    table.insert([{"string": "d", "integer": 4, "dt": dt.datetime(2000, 1, 4)}])
+    # The result is taken from the cache.
+    assert table.get_count_rows(cache_ttl=60) == 4
+    assert table.get_count_rows() == 5
+
+    if find_spec("pandas"):
+        query = "SELECT * FROM {}.{}".format(table.db, table.table)
+        df = cached_client.get_df(query, cache_ttl=60)
+        assert cached_client.get_df(query, cache_ttl=60).equals(df)
+
+    stats = cached_client.result_cache_stats()
+    assert stats["hits"] >= 1
+    cached_client.disconnect()
+
+
+@_decorator_function
+def test_metrics_hooks(db, table):
+    from clickhousepy import MetricsRegistry
+
+    registry = MetricsRegistry()
+    events = []
+    handle = client.add_hook(before=events.append, after=registry.observe)
+    try:
+        table.select(limit=2)
+        table.get_count_rows()
+        # query, params, with_column_types, external_tables, query_id
+        client.execute("SELECT 1", None, False, None)
+        client.execute("SELECT 1", None, False, None, "query-1")
+    finally:
+        client.remove_hook(handle)
+
+    assert [e.method for e in events] == ["select", "get_count_rows", "execute", "execute"]
+    assert all(e.query_id for e in events)
+    assert events[-1].query_id == "query-1"
+
+    # The queries of the worker threads are tagged with the outer method.
+    table2 = table.copy_table(TEST_DB, TEST_TABLE + "_copy", return_new_table=True)
+    events = []
+    handle = client.add_hook(before=events.append)
+    try:
+        table2.copy_data_from(TEST_DB, TEST_TABLE, parallel="partition", workers=2)
+    finally:
+        client.remove_hook(handle)
+    assert {e.method for e in events} == {"copy_data"}
+    snapshot = registry.snapshot()
+    assert snapshot[("select", TEST_DB, TEST_TABLE)]["read_rows_total"] > 0
+    text = registry.to_prometheus()
+    print(text)
+    assert 'clickhousepy_queries_total{method="get_count_rows"' in text
+
+
+def test_async_client():
+    import asyncio
+
+    from clickhousepy import AsyncClient
+
+    async def run():
+        async with AsyncClient(client=client) as aclient:
+            await aclient.drop_db(TEST_DB)
+            db = await aclient.create_db(TEST_DB)
+            table = await db.create_table_mergetree(
+                TEST_TABLE, columns=["i UInt32"], orders=["i"]
+            )
+            await asyncio.gather(*[table.insert([{"i": i}]) for i in range(50)])
+            assert await table.get_count_rows() == 50
+            await table.delete(where="i < 10", prevent_parallel_processes=True)
+            await table.update(
+                update="i = 100", where="i = 10", prevent_parallel_processes=True
+            )
+            await table.drop_table()
+            await db.drop_db()
+
+    asyncio.run(run())
+    # The client passed to AsyncClient is not disconnected by it.
+    assert client.execute("SELECT 1") == [(1,)]
+    assert client.pool_stats()["size"] > 0
+
+
+def test_async_client_iterators():
+    import asyncio
+
+    from clickhousepy import AsyncClient
+
+    async def run():
+        async with AsyncClient(**CLIENT_KWARGS, pool_max_size=2) as aclient:
+            # Both connections are held by the iterators,
+            # the queries wait for them while the iterators are advanced.
+            iterators = [
+                aclient.get_df_iter("SELECT number FROM numbers(3)", chunk_rows=1)
+                for _ in range(2)
+            ]
+            for iterator in iterators:
+                await iterator.__anext__()
+            queries = [asyncio.ensure_future(aclient.execute("SELECT 1")) for _ in range(2)]
+            for iterator in iterators:
+                assert len([i async for i in iterator]) == 2
+            results = await asyncio.wait_for(asyncio.gather(*queries), timeout=10)
+            assert results == [[(1,)], [(1,)]]
+
+    asyncio.run(run())
+
+
+def test_fake_server():
+    from tests.fake_server import FakeServer
+
+    with FakeServer(mutation_delay=0.5) as server:
+        fake_client = server.client()
+        table = fake_client.create_db(TEST_DB).create_table_mergetree(
+            TEST_TABLE, columns=["s String", "i UInt32"], orders=["s"], partition=["s"]
+        )
+        table.insert([{"s": str(i % 3), "i": i} for i in range(10)])
+        assert [i[0] for i in table.get_partitions()] == ["0", "1", "2"]
+        assert fake_client.execute(
+            "SELECT s, count(), sum(i) FROM {}.{} GROUP BY s ORDER BY s".format(
+                TEST_DB, TEST_TABLE
+            )
+        ) == [("0", 4, 18), ("1", 3, 12), ("2", 3, 15)]
+
+        mutation = table.delete(where="i > 5")
+        assert table.get_count_rows() == 6
+        assert not fake_client.is_mutation_done(mutation)
+        table.wait_mutations(mutation, timeout=5)
+
+        try:
+            fake_client.execute("SELECT * FROM {}.unknown".format(TEST_DB))
+        except Exception as e:
+            assert e.code == 60
+        else:
+            raise AssertionError("Exception is expected")
+        fake_client.disconnect()
+
+
+def test_lazy_imports():
+    import subprocess
+    import sys
+
+    # The driver, pandas and asyncio are imported only when they are used.
+    code = (
+        "import sys, clickhousepy\n"
+        "client = clickhousepy.Client('localhost')\n"
+        "client.Table('db', 'table')\n"
+        "print([m for m in ('clickhouse_driver', 'pandas', 'numpy', 'asyncio') "
+        "if m in sys.modules])\n"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    ).stdout
+    assert output.strip() == "[]"
+
+
+def test_show():
+    client.drop_db(TEST_DB)
+    client.create_db(TEST_DB)
+    client.create_table_log(TEST_DB, TEST_TABLE, columns=["s String", "d DateTime"])
+    print(client.show_process())
+    print(client.show_databases())
+    print(client.show_tables(TEST_DB))
+    print(client.show_create_table(TEST_DB, TEST_TABLE))
+    print(client.describe(TEST_DB, TEST_TABLE))
+    client.drop_db(TEST_DB)
+
+
+def test_get_mutations():
+    r = client.get_mutations(limit=3, columns=["database", "table", "is_done"])
+    pprint(r)
+
+
+@_decorator_function
+def test_mutation_update(db, table):
+    table.update(
+        update="""  integer = 10   """,
+        where="""  integer = 1   """,
+        prevent_parallel_processes=True,
+        sleep=1,
+    )
+    assert [(10,)] == table.select(columns=["integer"], where="integer = 10")
+
+
+@_decorator_function
+def test_mutation_delete(db, table):
+    table.delete(where="integer = 3", prevent_parallel_processes=True, sleep=1)
+    assert table.get_count_rows() == 2
+
+
+@real_clickhouse
+@_decorator_function
+def test_mutation_tracker(db, table):
+    ids = [
+        table.update(update="integer = 10", where="integer = 1"),
+        table.delete(where="integer = 3"),
+    ]
+    statuses = client.wait_mutations(ids, timeout=60)
+    assert len(statuses) == 2
+    assert all(i.is_done and i.parts_to_do == 0 for i in statuses.values())
+    assert table.get_count_rows() == 2
+
+    mutation_id = table.update(update="integer = 11", where="integer = 10")
+    status = client.mutation_tracker.future(mutation_id).result(timeout=60)
+    assert status.is_done and not status.latest_fail_reason
+
+    # Each of the simultaneous mutations gets its own id, the command text is not compared.
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        ids = list(
+            executor.map(
+                lambda i: table.update(
+                    update="integer = {}".format(i), where="\n  integer =  {}".format(i)
+                ),
+                range(20, 24),
+            )
+        )
+    assert None not in ids and len(set(ids)) == 4
+
+
+@_decorator_function
+def test_mutation_tracker_missing(db, table):
+    # A missing mutation is done, as in wait_mutations, the thread stops.
+    assert client.wait_mutations([(TEST_DB, TEST_TABLE, "mutation_999.txt")]) == {}
+    future = client.mutation_tracker.future((TEST_DB, TEST_TABLE, "mutation_999.txt"))
+    thread = client.mutation_tracker._thread
+    assert future.result(timeout=10) is None
+    thread.join(timeout=10)
+    assert not thread.is_alive()
+    assert client.mutation_tracker._thread is None
+
+
+def test_mutation_tracker_fail():
+    from unittest import mock
+
+    from clickhousepy.mutations import MutationFailedError, MutationStatus, MutationTracker
+
+    tracker = MutationTracker(client, initial_interval=0.01)
+    status = MutationStatus(
+        TEST_DB, TEST_TABLE, "mutation_1.txt", "DELETE WHERE 1", None, 0, 1, "Code: 6."
+    )
+    with mock.patch.object(tracker, "statuses", return_value={"mutation_1.txt": status}):
+        future = tracker.future("mutation_1.txt")
+        thread = tracker._thread
+        try:
+            future.result(timeout=10)
+        except MutationFailedError as e:
+            assert e.statuses == {"mutation_1.txt": status}
+        else:
+            raise AssertionError("Exception is expected")
+    thread.join(timeout=10)
+    assert not thread.is_alive() and tracker._thread is None
+
+
+@real_clickhouse
+@_decorator_function
+def test_mutation_batch(db, table):
+    with table.mutation_batch() as batch:
+        batch.update("integer = 10", "integer = 1")
+        batch.delete("integer = 10")
+        batch.delete("integer = 3")
+    assert batch.mutation_id
+    assert batch.wait(timeout=60).is_done
+    assert table.select(columns=["integer"]) == [(2,)]
+
+
+@_decorator_function
+def test_insert_transform_from_table(db, table):
+    table_2 = TEST_TABLE + "2"
+    table_2 = db.create_table_mergetree(
+        table_2,
+        columns=["integer String"],
+        orders=["integer"]
+    )
+    table_2.insert_transform_from_table(table.db, table.table)
+    data = table_2.select()
+    print(data)
+    tdata = [i[0] for i in data]
+    assert ['1', '2', '3', '3'] == tdata
+
+
+@_decorator_function
+def test_insert_chunks(db, table):
+    rows = ({"string": "d", "integer": i, "dt": dt.datetime(2000, 1, 4)} for i in range(10))
+    r = table.insert(rows, chunk_rows=3)
+    print(repr(r))
+    assert r == 10
+    assert [i.rows for i in r.blocks] == [3, 3, 3, 1]
+
+    r = table.insert(iter([("e", 1, dt.datetime(2000, 1, 5))] * 5), chunk_bytes=20)
+    assert r == 5 and len(r.blocks) > 1
+    assert table.get_count_rows() == 19
+
+
+@_decorator_function
+def test_buffered_inserter(db, table):
+    import threading
+
+    with table.buffered_inserter(flush_rows=3, flush_interval=0.5) as inserter:
+        for i in range(10):
+            inserter.add({"string": "d", "integer": i, "dt": dt.datetime(2000, 1, 4)})
+        inserter.flush()
+        assert table.get_count_rows() == 14
+
+        # The row is inserted by the thread after flush_interval, without flush.
+        inserted = threading.Event()
+        handle = client.add_hook(
+            after=lambda e: e.query.startswith("INSERT") and inserted.set()
+        )
+        try:
+            inserter.add(("e", 1, dt.datetime(2000, 1, 5)))
+            assert inserted.wait(timeout=10)
+        finally:
+            client.remove_hook(handle)
+        assert table.get_count_rows() == 15
+    print(inserter.stats())
+    assert inserter.stats()["inserted_rows"] == 11
+
+
+@_decorator_function
+def test_bulk_load(db, table):
+    rows = (("d", i, dt.datetime(2000, 1, 4)) for i in range(1000))
+    r = table.bulk_load(rows, workers=3, block_rows=100)
+    print(r)
+    assert r.rows == 1000 and r.blocks == 10 and not r.errors
+    assert table.get_count_rows() == 1004
+
+    if find_spec("pandas"):
+        df = table.select(dataframe=True, columnar=True, limit=1000)
+        r = table.bulk_load(df, workers=2, block_rows=300, mode="process")
+        assert r.rows == 1000 and r.blocks == 4
+
+        # The workers read the slices of the CSV file themselves.
+        import tempfile
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "bulk.csv")
+            df.to_csv(path, index=False)
+            r = table.bulk_load(path, workers=2, block_rows=300, mode="process")
+        assert r.rows == 1000 and r.blocks == 4
+        assert table.get_count_rows() == 3004
+
+        df["unknown"] = 1
+        for mode in ("thread", "process"):
+            try:
+                table.bulk_load(df, mode=mode)
+            except Exception as e:
+                assert "unknown" in str(e)
+            else:
+                raise AssertionError("Exception is expected")
+
+
+@_decorator_function
+def test_export(db, table):
+    import csv
+    import gzip
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "data.csv")
+        files = table.export(path, order_by="integer")
+        assert [(i.path, i.rows) for i in files] == [(path, 4)]
+        with open(path) as f:
+            rows = list(csv.reader(f))
+        assert rows[0] == ["string", "integer", "dt"]
+        assert rows[1] == ["a", "1", "2000-01-01 00:00:00"]
+
+        files = client.export(
+            "SELECT * FROM {}.{}".format(TEST_DB, TEST_TABLE),
+            os.path.join(directory, "data.tsv.gz"),
+            max_file_rows=3,
+            block_rows=2,
+            header=False,
+        )
+        assert [i.rows for i in files] == [3, 1]
+        with gzip.open(files[0].path, "rt") as f:
+            assert len(f.read().splitlines()) == 3
+
+        files = table.export(
+            os.path.join(directory, "data.native"), parallel="partition", workers=2
+        )
+        assert len(files) == 3 and sum(i.rows for i in files) == 4
+
+        if find_spec("pyarrow"):
+            import pyarrow.parquet as pq
+
+            files = table.export(os.path.join(directory, "data.parquet"), where="string = 'c'")
+            assert pq.read_table(files[0].path).column("integer").to_pylist() == [3, 3]
+
+        # The codec of parquet is not the compression of the file.
+        with pytest.raises(ValueError):
+            table.export(os.path.join(directory, "data.parquet.gz"))
+        assert not os.path.exists(os.path.join(directory, "data.parquet.gz"))
+
+        # The file of the failed export is deleted.
+        from unittest import mock
+
+        def fail(*args, **kwargs):
+            yield [("string", "String"), ("integer", "UInt32")]
+            yield ("a", 1)
+            raise ConnectionError("Connection reset")
+
+        path = os.path.join(directory, "failed.csv")
+        with mock.patch.object(client, "execute_iter", fail):
+            try:
+                client.export("SELECT string, integer", path, block_rows=1)
+            except ConnectionError:
+                pass
+            else:
+                raise AssertionError("Exception is expected")
+        assert not os.path.exists(path)
+
+
+@_decorator_function
+def test_load_file(db, table):
+    import tempfile
+
+    rows = sorted(table.select())
+    with tempfile.TemporaryDirectory() as directory:
+        with open(os.path.join(directory, "data.tsv"), "w") as f:
+            f.write("integer\tstring\tunknown\n7\tx\\ty\t0\n")
+        r = table.load_file(os.path.join(directory, "data.tsv"))
+        assert [(i.rows, i.blocks) for i in r] == [(1, 1)]
+        assert table.select(columns=["string"], where="integer = 7") == [("x\ty",)]
+        client.mutation_tracker.wait(table.delete(where="integer = 7"), timeout=60)
+
+        table2 = table.copy_table(TEST_DB, TEST_TABLE + "_load", return_new_table=True)
+        formats = ["csv.gz", "native"] + (["parquet"] if find_spec("pyarrow") else [])
+        for format_ in formats:
+            table.export(os.path.join(directory, "data." + format_), max_file_rows=3)
+            r = table2.load_file(
+                os.path.join(directory, "data_*." + format_), block_rows=2, workers=2
+            )
+            assert [i.rows for i in r] == [3, 1]
+            assert sorted(table2.select()) == rows
+            table2.truncate()
+
+
+@_decorator_function
+def test_insert_select(db, table):
+    # client.insert_select()
+    table.insert_select(query="SELECT * FROM {}.{}".format(table.db, table.table))
+    table.insert_select(
+        query="SELECT string FROM {}.{}".format(table.db, table.table),
+        columns=["string"]
+    )
+    print(
+        table.select()
+    )
+    assert table.get_count_rows() == 16
+
+
+@_decorator_function
+def test_select(db, table):
+    data = table.select()
+    data = table.select(limit=1)
+    data = table.select(limit=1, offset=1)
+    data = table.select(limit=1, offset=1, columns=["integer"])
+    data = table.select(limit=1, offset=1, columns=["integer", "string"], where="string='c'")
+    assert data == [(3,"c")]
+
+
+@_decorator_function
+def test_select_iter(db, table):
+    rows = list(table.select_iter(columns=["integer"], order_by="integer", block_size=2))
+    assert rows == [(1,), (2,), (3,), (3,)]
+
+    batches = list(table.select_iter(columns=["integer"], order_by="integer", block_size=2, batch=True))
+    assert batches == [[(1,), (2,)], [(3,), (3,)]]
+
+
+@_decorator_function
+def test_select_pages(db, table):
+    pages = list(table.select_pages(page_size=1, columns=["string", "integer"]))
+    # Rows with the same key are not split between pages.
+    assert [rows for rows, _ in pages] == [[("a", 1)], [("b", 2)], [("c", 3), ("c", 3)]]
+
+    _, cursor = pages[0]
+    resumed = list(table.select_pages(page_size=10, columns=["string"], cursor=cursor))
+    assert [rows for rows, _ in resumed] == [[("b",), ("c",), ("c",)]]
+
+    # The key is aware datetime, the driver returns it for columns with a time zone.
+    table2 = db.create_table_mergetree(
+        TEST_TABLE + "_tz", columns=["d DateTime('Europe/Moscow')", "i UInt32"], orders=["d"]
+    )
+    table2.insert([{"d": dt.datetime(2000, 1, i), "i": i} for i in range(1, 4)])
+    pages = list(table2.select_pages(page_size=1, columns=["i"]))
+    assert [rows for rows, _ in pages] == [[(1,)], [(2,)], [(3,)]]
+    resumed = list(table2.select_pages(page_size=10, columns=["i"], cursor=pages[0][1]))
+    assert [rows for rows, _ in resumed] == [[(2,), (3,)]]
+
+
+@_decorator_function
+def test_get_df(db, table):
+    if find_spec("pandas"):
+        query = "SELECT arrayJoin({0}) as a, arrayJoin({0}) as ba".format(
+            list(range(3))
+        )
+        r = client.get_df(query)
+        print(r)
+
+        r = table.select()
+        print(r)
+
+        r = table.select(limit=1)
+        r = table.select(limit=1, offset=1)
+        r = table.select(limit=1, offset=1, columns=["string"])
+        print(r)
+
+
+@_decorator_function
+def test_get_df_columnar(db, table):
+    if find_spec("pandas"):
+        r = table.select(dataframe=True, columnar=True)
+        print(r.dtypes)
+        assert list(r.columns) == ["string", "integer", "dt"]
+        assert str(r["integer"].dtype) == "uint32"
+        assert str(r["dt"].dtype) == "datetime64[ns]"
+
+        r = client.get_df("SELECT 1 as a WHERE a > 1", columnar=True)
+        assert list(r.columns) == ["a"] and len(r) == 0
+
+
+@_decorator_function
+def test_get_df_iter(db, table):
+    if find_spec("pandas"):
+        query = "SELECT number FROM numbers(10)"
+        chunks = list(client.get_df_iter(query, chunk_rows=4))
+        assert [len(df) for df in chunks] == [4, 4, 2]
+        assert len({str(df["number"].dtype) for df in chunks}) == 1
+
+        chunks = list(table.select_df_iter(columns=["string"], chunk_rows=3))
+        assert sum(len(df) for df in chunks) == 4
+
+        # Categories are the same in all chunks, DateTime('tz') keeps the time zone.
+        from unittest import mock
+
+        result = [
+            [("e", "Enum8('b' = 2, 'a' = 1)"), ("d", "DateTime('Europe/Moscow')")],
+            ("a", dt.datetime(2000, 1, 1)),
+            ("a", dt.datetime(2000, 1, 2)),
+            ("b", dt.datetime(2000, 1, 3)),
+        ]
+        with mock.patch.object(client, "execute_iter", return_value=iter(result)):
+            chunks = list(client.get_df_iter("SELECT e, d", chunk_rows=2))
+        assert [list(df["e"].cat.categories) for df in chunks] == [["a", "b"]] * 2
+        assert [str(df["d"].dtype) for df in chunks] == ["datetime64[ns, Europe/Moscow]"] * 2
+        assert str(chunks[0]["d"][0]) == "2000-01-01 00:00:00+03:00"
+
+
+@_decorator_function
+def test_insert_df(db, table):
+    if find_spec("pandas"):
+        import pandas as pd
+
+        table.add_column("alias_col", "String", expr="ALIAS string")
+        df = pd.DataFrame(
+            {
+                "string": ["d", "e", "f"],
+                "integer": [4.0, 5.0, 6.0],
+                "dt": pd.to_datetime(["2000-01-04", "2000-01-05", "2000-01-06"]),
+                "alias_col": ["x", "y", "z"],
+            }
+        )
+        assert table.insert_df(df, chunk_rows=2) == 3
+        assert table.select(columns=["integer"], where="string = 'f'") == [(6,)]
+
+        df = table.select(dataframe=True, columnar=True, limit=100)
+        table.truncate()
+        table.insert_df(df)
+        assert table.get_count_rows() == 7
+
+        # Aware datetimes are converted by the driver, not turned into naive UTC.
+        import numpy as np
+
+        data = {
+            "string": np.array(["g", "h"]),
+            "integer": np.array([7, 8], dtype="uint32"),
+            "dt": pd.to_datetime(["2000-01-07 03:00", "2000-01-08 03:00"]).tz_localize(
+                "Europe/Moscow"
+            ),
+        }
+        assert table.insert_df(data) == 2
+        assert table.select(
+            columns=["toUnixTimestamp(dt)"], where="string = 'g'"
+        ) == [(947203200,)]
+
+
+def test_get_empty_df():
+    if find_spec("pandas"):
+        r = client.get_df("SELECT 1 as a WHERE a > 1")
+        print(r)
+        assert list(r.columns) == ["a"] and len(r) == 0
+
+
+@_decorator_function
+def test_table_stats(db, table):
+    table_2 = db.create_table_mergetree(
+        TEST_TABLE + "2", columns=["d Date", "i UInt32"], orders=["i"], partition=["d"]
+    )
+    table_2.insert([[dt.date(2000, 1, 1), 1], [dt.date(2000, 1, 3), 2]])
+    stats = table_2.stats()
+    pprint(stats)
+    assert stats["rows"] == 2 and stats["partitions"] == 2
+    assert (stats["min_date"], stats["max_date"]) == (dt.date(2000, 1, 1), dt.date(2000, 1, 3))
+    assert set(stats["columns"]) == {"d", "i"}
+
+    stats = table_2.stats(where="i = 2")
+    assert stats["rows"] == 1 and stats["min_date"] == dt.date(2000, 1, 3)
+
+    assert table.stats()["rows"] == 4
+
+
+@_decorator_function
+def test_get_df_names_from_result(db, table):
+    if find_spec("pandas"):
+        r = client.get_df("SELECT 1 AS a, toNullable(2) AS b")
+        assert list(r.columns) == ["a", "b"]
+
+        r = client.get_df("SELECT 1 AS a, toNullable(2) AS b", typed=True)
+        assert str(r["a"].dtype) == "uint8" and str(r["b"].dtype) == "UInt8"
+
+        r = table.select(dataframe=True, columns=["string", "integer * 2 AS double"])
+        assert list(r.columns) == ["string", "double"]
+
+
+def test_readme_df():
+    client.create_db(TEST_DB)
+    client.create_table_mergetree(
+        TEST_DB, TEST_TABLE,
+        columns=["i UInt32"],
+        orders=["i"],
+    )
+    client.insert(
+        TEST_DB, TEST_TABLE,
+        [{"i": 1}, {"i": 2}],
+    )
+    query = "SELECT i FROM {}.{}".format(TEST_DB, TEST_TABLE)
+
+    if find_spec("pandas"):
+        r = client.get_df(query, columns_names=["Col Integer"])
+        print("data in dataframe format:\n", r)
+
+    client.drop_db(TEST_DB)
+
+
+def test_readme():
+    client.drop_db(TEST_DB)
+    client.drop_table(TEST_DB, TEST_TABLE)
+    client.drop_table(TEST_DB, TEST_TABLE + "_new")
+    r = client.test_connection()
+    print(r)
+    ##
+    ##
+    ##
+    r = client.show_databases()
+    print("список баз данных:", r)
+
+    client.create_db(TEST_DB)
+    # Создание таблицы.
+    client.create_table_mergetree(
+        TEST_DB, TEST_TABLE,
+        columns=[("s", "String")],
+        orders=["s"],
+    )
+    # Вставка данных.
+    # Подробнее об этом тут
+    # https://clickhouse-driver.readthedocs.io/en/latest/quickstart.html#inserting-data
+    client.insert(
+        TEST_DB, TEST_TABLE,
+        [{"s": "1"}],
+    )
+
+    r = client.exists(TEST_DB, TEST_TABLE)
+    print("таблица существует? ", r)
+
+    r = client.get_count_rows(TEST_DB, TEST_TABLE)
+    print("кол-во строк:", r)
+
+    # Любой запрос.
+    r = client.execute("SELECT * FROM {}.{}".format(TEST_DB, TEST_TABLE))
+    print("данные запроса:", r)
+
+    ### Сущность DB
+    db = client.DB(TEST_DB)
+    r = db.show_tables()
+    print("список таблиц базы данных {}:".format(TEST_DB), r)
+
+    table = client.Table(TEST_DB, TEST_TABLE)
+    r = table.get_count_rows()
+    print("кол-во строк:", r)
+
+    # Очистка таблицы.
+    table.truncate()
+    # Удаление таблицы.
+    table.drop_table()
+    # Удаление базы данных.
+    db.drop_db()
+
+    ### Сущность Table
+    db = client.create_db(TEST_DB)
+
+    table = db.create_table_mergetree(
+        TEST_TABLE,
+        columns=[("s", "String"), ("t", "String"), ("d", "Date")],
+        orders=["d"],
+        partition=["s", "d"],
+    )
+
+    r = table.show_create_table()
+    print("описание создания таблицы", r)
+
+    r = table.describe()
+    print("столбцы таблицы", r)
+
+    print("вставка данных")
+    table.insert(
+        [
+            {"s": "1", "t": "1", "d": dt.datetime(2000, 1, 1)},
+            {"s": "2", "t": "2", "d": dt.datetime(2000, 1, 2)},
+            {"s": "3", "t": "3", "d": dt.datetime(2000, 1, 3)},
+            {"s": "4", "t": "4", "d": dt.datetime(2000, 1, 4)},
+        ],
+        columns=["s", "t", "d"],
+    )
+
+    data = table.select()
+    print("Первые 10 строк таблицы", data)
+
+    data = table.select(limit=1, columns=["s"], where="s = '2'")
+    print("Выборка с фильтрацией", data)
+
+    r = table.get_count_rows()
+    print("кол-во строк:", r)
+
+    r = table.get_min_date(date_column_name="d")
+    print("минимальная дата:", r)
+
+    r = table.get_max_date(date_column_name="d")
+    print("максимальная дата:", r)
+
+    print("удаление партиций")
+    table.drop_partitions([["3", "2000-01-03"], ["4", "2000-01-04"]])
+
+    r = table.get_count_rows()
+    print("кол-во строк после удаления партиций:", r)
+
+    print("мутация обновления строки")
+    table.update(update="t = '20' ", where="t = '2' ")
+
+    print("мутация удаления строки")
+    table.delete(where="t = '20'")
+    time.sleep(1)
+    r = table.get_count_rows()
+    print("кол-во строк после мутации удаления строки:", r)
+
+    print("очистка таблицы")
+    table.truncate()
+    r = table.get_count_rows()
+    print("кол-во строк после очистки таблицы:", r)
+
+    new_table_name = TEST_TABLE + "_new"
+    print("переименование таблицы {} в {}".format(TEST_TABLE, new_table_name))
+    table.rename(TEST_DB, new_table_name)
+
+    r = client.exists(TEST_DB, TEST_TABLE)
+    print("существует таблица {}?".format(TEST_TABLE), r)
+
+    print("удаление таблиц")
+    table.drop_table()
+
+    print("удаление базы данных")
+    db.drop_db()